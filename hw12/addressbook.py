@@ -0,0 +1,1797 @@
+"""
+Contacts, the in-memory AddressBook and its JSON persistence.
+
+Fields, records and the indexed AddressBook with its query planner; the
+thread-safe ConcurrentAddressBook; loading and saving JSON books with the
+pickle cache, the change journal and the background autosaver; and
+importing contacts from CSV and vCard files. The SQLite, snapshot and
+sharded backends subclass AddressBook in modules of their own.
+"""
+
+from array import array
+import base64
+from bisect import bisect_left, bisect_right, insort
+from calendar import isleap, month_abbr, month_name
+from collections import UserDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+import functools
+import csv
+import gc
+import hashlib
+from itertools import chain, count, islice
+import os
+import pickle
+import re
+import sys
+import threading
+from datetime import date, datetime, timedelta
+import json
+
+
+NGRAM_SIZE = 3
+JOURNAL_SUFFIX = ".journal"
+CACHE_SUFFIX = ".cache"
+# Bump when the pickled AddressBook layout changes so old caches are ignored.
+CACHE_VERSION = 3
+COMPACT_THRESHOLD = 1000
+AUTOSAVE_INTERVAL = 5
+AUTOSAVE_CHANGES = 100
+STREAM_CHUNK_SIZE = 1 << 16
+IMPORT_BATCH_SIZE = 10_000
+SHOW_CHUNK_LINES = 256
+COMPLETION_LIMIT = 100
+# An index is intersected only while its estimate is within this factor of the
+# current candidates; beyond that, testing each candidate is cheaper.
+INTERSECT_RATIO = 8
+QUERY_TERM = re.compile(r'(name|phone|month)(=|\^|~)(\S+)')
+# Sorts after every character, so prefix + PREFIX_END bounds the names starting with prefix.
+PREFIX_END = "\U0010ffff"
+PHONE_PATTERN = re.compile(r'\d{10}')
+BIRTHDAY_PATTERN = re.compile(r'(\d{4})-(\d\d?)-(\d\d?)')
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def birthday_in_year(month, day, year):
+    """Feb 29 birthdays are celebrated on Feb 28 in common years."""
+    if month == 2 and day == 29 and not isleap(year):
+        day = 28
+    return date(year, month, day)
+
+
+def parse_birthday(text):
+    """Parse a YYYY-MM-DD birthday into a date, or return None if it is invalid.
+
+    The common zero-padded form is handled by a precompiled regex; anything
+    else falls back to strptime so the accepted formats stay the same.
+    """
+    match = BIRTHDAY_PATTERN.fullmatch(text)
+    if match:
+        try:
+            return date(*map(int, match.groups()))
+        except ValueError:
+            return None
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def next_birthday(birthday, today):
+    upcoming = birthday_in_year(birthday.month, birthday.day, today.year)
+    if upcoming < today:
+        upcoming = birthday_in_year(birthday.month, birthday.day, today.year + 1)
+    return upcoming
+
+
+class Field:
+    __slots__ = ('__value',)
+
+    def __init__(self, value=None):
+        self.__value = value
+
+    @property
+    def value(self):
+        return self.__value
+
+    @value.setter
+    def value(self, new_value):
+        self.__value = new_value
+
+    @classmethod
+    def trusted(cls, value):
+        """Build a field from a value that has already been validated."""
+        field = cls.__new__(cls)
+        field.__value = value
+        return field
+
+    def __str__(self):
+        return str(self.__value)
+
+
+class Name(Field):
+    __slots__ = ()
+
+
+class Phone(Field):
+    __slots__ = ()
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+    @Field.value.setter
+    def value(self, new_value):
+        if not self.validate(new_value):
+            raise ValueError("Phone number must be 10 digits")
+        self._Field__value = new_value
+
+    @staticmethod
+    def validate(phone):
+        return PHONE_PATTERN.fullmatch(phone) is not None
+
+
+class Birthday(Field):
+    __slots__ = ('date',)
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+    @Field.value.setter
+    def value(self, new_value):
+        parsed = parse_birthday(new_value) if isinstance(new_value, str) else None
+        if parsed is None:
+            raise ValueError("Birthday must be in YYYY-MM-DD format")
+        self.date = parsed
+        self._Field__value = new_value
+
+    @classmethod
+    def trusted(cls, value, parsed=None):
+        field = super().trusted(value)
+        field.date = parsed or parse_birthday(value)
+        return field
+
+    @staticmethod
+    def validate(birthday):
+        return parse_birthday(birthday) is not None
+
+
+class Record:
+    __slots__ = ('name', 'birthday', 'phones', '_book', '__weakref__')
+
+    def __init__(self, name, birthday=None):
+        self.name = Name(name)
+        self.birthday = Birthday(birthday) if birthday else None
+        self.phones = []
+        self._book = None
+
+    @classmethod
+    def from_trusted(cls, name, phones, birthday=None, birthday_date=None):
+        """Build a record from values that were validated in bulk, skipping per-field checks."""
+        record = cls(name)
+        record.birthday = Birthday.trusted(birthday, birthday_date) if birthday else None
+        record._set_trusted_phones(phones)
+        return record
+
+    def add_phone(self, phone):
+        phone = Phone(phone)
+        with self._writing():
+            self._check_phone(phone.value)
+            self.phones.append(phone)
+            self._changed()
+
+    def remove_phone(self, phone):
+        with self._writing():
+            self.phones = [p for p in self.phones if p.value != phone]
+            self._changed()
+
+    def edit_phone(self, old_phone, new_phone):
+        with self._writing():
+            for phone in self.phones:
+                if phone.value == old_phone:
+                    self._check_phone(new_phone)
+                    phone.value = new_phone
+                    self._changed()
+                    return
+        raise ValueError("Phone number not found")
+
+    def find_phone(self, phone):
+        return next((p for p in self.phones if p.value == phone), None)
+
+    def phone_values(self):
+        return [phone.value for phone in self.phones]
+
+    def days_to_birthday(self, today=None):
+        if self.birthday is None:
+            return None
+        today = today or date.today()
+        return (next_birthday(self.birthday.date, today) - today).days
+
+    def matches(self, query):
+        return query.lower() in self.name.value.lower() or any(query in phone for phone in self.phone_values())
+
+    def _set_trusted_phones(self, phones):
+        self.phones = [Phone.trusted(phone) for phone in phones]
+
+    def _writing(self):
+        return self._book._writing() if self._book is not None else nullcontext()
+
+    def _check_phone(self, phone):
+        if self._book is not None:
+            self._book._check_phone(self.name.value, phone)
+
+    def _changed(self):
+        if self._book is not None:
+            self._book._reindex(self)
+
+    def __str__(self):
+        return f"Contact name: {self.name.value}, phones: {'; '.join(self.phone_values())}"
+
+
+class CompactRecord(Record):
+    """Record that keeps its phones packed in an array of 64-bit integers.
+
+    Phone objects are only created when .phones is read, and those objects
+    are copies: edit numbers through add_phone/edit_phone/remove_phone.
+    """
+
+    __slots__ = ('_numbers',)
+
+    def __init__(self, name, birthday=None):
+        self._numbers = array('Q')
+        super().__init__(name, birthday)
+
+    @property
+    def phones(self):
+        return [Phone(phone) for phone in self.phone_values()]
+
+    @phones.setter
+    def phones(self, phones):
+        self._numbers = array('Q', [self._pack(phone.value) for phone in phones])
+
+    def add_phone(self, phone):
+        number = self._pack(phone)
+        with self._writing():
+            self._check_phone(phone)
+            self._numbers.append(number)
+            self._changed()
+
+    def remove_phone(self, phone):
+        with self._writing():
+            if Phone.validate(phone) and phone.isascii():
+                number = int(phone)
+                self._numbers = array('Q', [n for n in self._numbers if n != number])
+            self._changed()
+
+    def edit_phone(self, old_phone, new_phone):
+        with self._writing():
+            if not (Phone.validate(old_phone) and old_phone.isascii() and int(old_phone) in self._numbers):
+                raise ValueError("Phone number not found")
+            number = self._pack(new_phone)
+            self._check_phone(new_phone)
+            self._numbers[self._numbers.index(int(old_phone))] = number
+            self._changed()
+
+    def find_phone(self, phone):
+        if Phone.validate(phone) and phone.isascii() and int(phone) in self._numbers:
+            return Phone(phone)
+        return None
+
+    def phone_values(self):
+        return [f"{number:010d}" for number in self._numbers]
+
+    def _set_trusted_phones(self, phones):
+        self._numbers = array('Q', map(int, phones))
+
+    @staticmethod
+    def _pack(phone):
+        return pack_phone(phone)
+
+
+def pack_phone(phone):
+    """Phone number as a 64-bit integer; only ASCII digits survive the round trip."""
+    if not (Phone.validate(phone) and phone.isascii()):
+        raise ValueError("Phone number must be 10 digits")
+    return int(phone)
+
+
+def edit_distance(a, b):
+    """Levenshtein distance: insertions, deletions and substitutions needed to turn a into b."""
+    # A shared prefix or suffix never costs an edit; names often share long ones.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def distance_from(name):
+    """Return a function giving the Levenshtein distance from name to a string.
+
+    Uses Myers' bit-parallel algorithm: the positions of each character
+    of name are encoded once as bit masks, after which a string of length
+    n costs n steps of integer arithmetic instead of a table of
+    len(name) * n cells. Ranking fuzzy candidates compares one query
+    against many names, so the masks are shared.
+    """
+    masks = {}
+    for i, char in enumerate(name):
+        masks[char] = masks.get(char, 0) | 1 << i
+    length = len(name)
+    full = (1 << length) - 1
+    last = 1 << length - 1 if length else 0
+
+    def distance(other):
+        if not length:
+            return len(other)
+        plus, minus, score = full, 0, length
+        for char in other:
+            eq = masks.get(char, 0)
+            vertical = eq | minus
+            horizontal = (((eq & plus) + plus) ^ plus) | eq
+            plus_h = minus | ~(horizontal | plus) & full
+            minus_h = plus & horizontal
+            if plus_h & last:
+                score += 1
+            elif minus_h & last:
+                score -= 1
+            plus_h = (plus_h << 1 | 1) & full
+            minus_h = minus_h << 1 & full
+            plus = minus_h | ~(vertical | plus_h) & full
+            minus = plus_h & vertical
+        return score
+
+    return distance
+
+
+def fuzzy_distance(query):
+    """Edits allowed by default for a query: one for very short ones, two otherwise."""
+    return 1 if len(query) < 4 else 2
+
+
+def name_grams(name, n=NGRAM_SIZE):
+    """n-grams of a lowercased name padded with a space on each side.
+
+    The padding gives the first and last letters n-grams of their own, so
+    short names keep some in common with their typos ("jonh" and "john"
+    share " jo").
+    """
+    return ngrams(f" {name} ", n)
+
+
+def index_grams(texts):
+    """Trigrams indexed for a contact's (lowercased name, *phones)."""
+    return name_grams(texts[0]).union(*map(ngrams, texts[1:]))
+
+
+def short_name_keys(texts):
+    """Keys indexed for short fuzzy queries: the padded bigrams and the length of a contact's lowercased name."""
+    return name_grams(texts[0], 2) | {len(texts[0])}
+
+
+def fuzzy_grams(name, max_distance):
+    """Padded n-grams of which any name within max_distance edits of name has at least one, or None.
+
+    Each edit touches at most n of them, so any n * max_distance + 1 will
+    do. Trigrams are tried first and bigrams for names too short for them;
+    None means even bigrams are too few and candidates have to be found by
+    their length.
+    """
+    for n in (NGRAM_SIZE, 2):
+        grams = sorted(name_grams(name, n))
+        if len(grams) > n * max_distance:
+            return grams
+    return None
+
+
+def fuzzy_candidates(postings, needed, lengths=None):
+    """Names that can be in at least needed of postings (sets of names, rarest first).
+
+    Such a name is in one of the len(postings) - needed + 1 rarest, so only
+    those are merged. Short queries also pass lengths, the sets of names of
+    each allowed length, which are read instead when they hold fewer names;
+    their bigram postings are broad, so candidates are then counted against
+    every posting before any distance is computed.
+    """
+    head = postings[:len(postings) - needed + 1]
+    if lengths is None:
+        return set().union(*head)
+    if needed >= 1 and sum(map(len, head)) <= sum(map(len, lengths)):
+        candidates = set().union(*head)
+        if needed == 1:
+            return candidates
+    else:
+        candidates = set().union(*lengths)
+        if needed < 1:
+            return candidates
+    return {candidate for candidate in candidates if sum(candidate in names for names in postings) >= needed}
+
+
+def rank_fuzzy(name, candidates, max_distance):
+    """Sorted (distance, folded, candidate) for (candidate, folded name) pairs within max_distance of name."""
+    ranked = []
+    distance_to = distance_from(name)
+    for candidate, folded in candidates:
+        if abs(len(folded) - len(name)) <= max_distance:
+            distance = distance_to(folded)
+            if distance <= max_distance:
+                ranked.append((distance, folded, candidate))
+    return sorted(ranked)
+
+
+class Query:
+    """Contacts matching every term of a query such as "name^an phone^050 month=3".
+
+    Each term is a field, an operator and a value. name and phone take =
+    (equals), ^ (starts with) and ~ (contains); month takes = with a number
+    or an English month name. Name equality and prefixes are case-sensitive
+    like lookups by name, ~ ignores case like search.
+    """
+
+    def __init__(self, text):
+        self.terms = []
+        for word in text.split():
+            match = QUERY_TERM.fullmatch(word)
+            if match is None:
+                raise ValueError(f"Invalid query term {word!r}, expected e.g. name^an, phone=0501234567, month=3")
+            field, op, value = match.groups()
+            if field == "month":
+                value = self._month(op, value)
+            self.terms.append((field, op, value))
+        if not self.terms:
+            raise ValueError("Please provide a query")
+
+    def matches(self, record):
+        return all(term_matches(term, record) for term in self.terms)
+
+    @staticmethod
+    def _month(op, value):
+        months = {name.lower(): number for names in (month_name, month_abbr)
+                  for number, name in enumerate(names) if name}
+        month = int(value) if value.isdigit() else months.get(value.lower())
+        if op != "=" or month not in range(1, 13):
+            raise ValueError(f"Invalid month term month{op}{value}, expected e.g. month=3 or month=march")
+        return month
+
+    def __str__(self):
+        return " ".join(map(format_term, self.terms))
+
+
+def term_matches(term, record):
+    field, op, value = term
+    if field == "month":
+        return record.birthday is not None and record.birthday.date.month == value
+    if field == "name":
+        texts = [record.name.value]
+    else:
+        texts = record.phone_values()
+    if op == "=":
+        return value in texts
+    if op == "^":
+        return any(text.startswith(value) for text in texts)
+    return any(value.lower() in text.lower() for text in texts)
+
+
+def name_key(name):
+    """Casefolded name tokens in sorted order, so "John Smith" and "smith JOHN" match."""
+    return " ".join(sorted(re.findall(r'\w+', name.casefold())))
+
+
+def duplicate_groups(rows):
+    """Group (name, phones, birthday) rows that share a phone or the same name_key.
+
+    Rows are bucketed by those blocking keys and each bucket is joined with
+    union-find, so the work grows with the number of rows, not of pairs.
+    Groups and their members come back in row order.
+    """
+    parent = {}
+
+    def root(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    first_with_key = {}
+    for name, phones, _ in rows:
+        parent[name] = name
+        key = name_key(name)
+        for block in ((("name", key),) if key else ()) + tuple(("phone", phone) for phone in phones):
+            other = first_with_key.setdefault(block, name)
+            if other != name:
+                parent[root(name)] = root(other)
+    groups = defaultdict(list)
+    for name in parent:
+        groups[root(name)].append(name)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def format_term(term):
+    field, op, value = term
+    return f"{field}{op}{value}"
+
+
+class LazySortedList:
+    """Sorted list whose bulk-loaded items are sorted on first read.
+
+    Items passed to the constructor are sorted once, when the list is
+    first read, so loading n items costs one O(n log n) sort instead of n
+    insort calls. After that every add() and remove() keeps the list
+    sorted in place with a bisect and one insert or delete, so a single
+    change never makes the next read sort the whole list again.
+    """
+
+    __slots__ = ('_items', '_sorted')
+
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._sorted = not self._items
+
+    @property
+    def items(self):
+        if not self._sorted:
+            self._items = sorted(self._items)
+            self._sorted = True
+        return self._items
+
+    def add(self, item):
+        if self._sorted:
+            insort(self._items, item)
+        else:
+            self._items.append(item)
+
+    def remove(self, item):
+        items = self._items
+        if self._sorted:
+            del items[bisect_left(items, item)]
+        else:
+            items.remove(item)
+
+
+class AddressBook(UserDict):
+    # Whether every change is persisted as it happens (no snapshot to save).
+    writes_through = False
+
+    def __init__(self, *args, unique_phones=True, record_class=Record, **kwargs):
+        self.unique_phones = unique_phones
+        self.record_class = record_class
+        self._phones = {}
+        self._shared_phones = set()
+        # Trigram postings, built by the first search that needs them, and
+        # bigram and length postings, built by the first short fuzzy query.
+        self._grams = None
+        self._short_grams = None
+        self._birthdays = LazySortedList()
+        self._birthday_keys = {}
+        self._names = LazySortedList()
+        self._indexed = {}
+        self._order = {}
+        self._sequence = count()
+        self.journal = None
+        self.autosaver = None
+        self.cached = False
+        # Bumped by every change, so cached results can tell they are stale.
+        self.version = 0
+        super().__init__(*args, **kwargs)
+
+    def __getstate__(self):
+        # Only the settings and the contacts are pickled, as plain rows in
+        # insertion order. Rows rebuild several times faster than pickle
+        # restores slotted objects, and rebuilding the indexes from them in
+        # one pass beats unpickling the indexes while keeping the file small.
+        # The journal and autosaver hold files and threads and stay behind.
+        return {"unique_phones": self.unique_phones, "record_class": self.record_class, "version": self.version,
+                "rows": [(name, record.phone_values(), *((record.birthday.value, record.birthday.date)
+                                                         if record.birthday else (None, None)))
+                         for name, record in self.data.items()]}
+
+    def __setstate__(self, state):
+        self.__init__(unique_phones=state["unique_phones"], record_class=state["record_class"])
+        self.version = state["version"]
+        self._load_rows(state["rows"])
+
+    def __setitem__(self, name, record):
+        for phone in record.phone_values():
+            self._check_phone(name, phone)
+        old_record = self.data.get(name)
+        if old_record is None:
+            self._order[name] = next(self._sequence)
+            self._names.add(name)
+        elif old_record is not record:
+            old_record._book = None
+        self.data[name] = record
+        record._book = self
+        self._reindex(record)
+
+    def __delitem__(self, name):
+        record = self.data.pop(name)
+        record._book = None
+        self._update_indexes(name, self._indexed.pop(name), ())
+        self._update_birthday(name, None)
+        del self._order[name]
+        self._names.remove(name)
+        self._log("delete", name)
+
+    def add_record(self, record):
+        self[record.name.value] = record
+
+    def find(self, name):
+        return self.data.get(name)
+
+    def delete(self, name):
+        if name in self.data:
+            del self[name]
+
+    def iterator(self, n):
+        records = list(self.data.values())
+        for i in range(0, len(records), n):
+            yield records[i:i + n]
+
+    def snapshot(self):
+        """Plain-data copy of the book, as written to contacts.db."""
+        return {record.name.value: record_to_dict(record) for record in self.data.values()}
+
+    def copy(self):
+        """Return a book with copies of the records and indexes of its own.
+
+        The copy lives in memory whatever the backend and has no journal or
+        autosaver. UserDict.copy would share the indexes and move every
+        record over to the copy.
+        """
+        book = self._empty_copy()
+        with book.allowing_shared_phones():
+            for record in self.values():
+                birthday = record.birthday
+                book.add_record(self.record_class.from_trusted(
+                    record.name.value, record.phone_values(), birthday and birthday.value, birthday and birthday.date))
+        return book
+
+    __copy__ = copy
+
+    def rows(self):
+        """(name, phones, birthday) for every contact, in insertion order."""
+        for record in self.data.values():
+            yield record.name.value, record.phone_values(), record.birthday.value if record.birthday else None
+
+    def save(self, filename):
+        if self.journal is not None:
+            self.journal.compact(self)
+        else:
+            save_contacts(self, filename)
+
+    def snapshot_writer(self, filename):
+        """Copy the book now and return a function that writes the copy to filename.
+
+        The returned function touches no live state, so it can run on another
+        thread while the book keeps changing.
+        """
+        return functools.partial(write_contacts, self.snapshot(), filename)
+
+    @contextmanager
+    def deferred_writes(self, filename):
+        """Skip per-change journaling inside the block and save once at the end."""
+        journal, self.journal = self.journal, None
+        try:
+            yield self
+        finally:
+            self.journal = journal
+            self.save(filename)
+
+    @contextmanager
+    def allowing_shared_phones(self):
+        """Accept phones owned by other contacts inside the block.
+
+        Used for contacts that are already on disk, so loading a file or
+        replaying a journal never fails on numbers shared before uniqueness
+        was enforced; duplicate_phones() lists them afterwards.
+        """
+        unique, self.unique_phones = self.unique_phones, False
+        try:
+            yield self
+        finally:
+            self.unique_phones = unique
+
+    def find_by_phone(self, phone):
+        owners = self._phones.get(phone)
+        return self.data[owners[0]] if owners else None
+
+    def duplicate_phones(self):
+        """Map each phone shared by several contacts to its records.
+
+        Shared phones come from books created with unique_phones=False or
+        from files loaded with them; otherwise new duplicates are rejected
+        with ValueError as they are added.
+        """
+        return {phone: [self.data[name] for name in self._phones[phone]] for phone in self._shared_phones}
+
+    def find_duplicates(self):
+        """Return groups of records that look like the same person, in insertion order.
+
+        Records are grouped when they share a phone (only possible with
+        unique_phones=False) or when their names have the same casefolded
+        tokens, directly or through other members of the group.
+        """
+        return [[self.data[name] for name in group] for group in duplicate_groups(self.rows())]
+
+    def merge_duplicates(self):
+        """Fold every group from find_duplicates into its first record and return a MergeReport.
+
+        The kept record gets the phones of the whole group without repeats
+        and the first birthday found in group order; differing birthdays
+        that were dropped are listed in the report.
+        """
+        report = MergeReport()
+        for kept, *others in self.find_duplicates():
+            group = [kept, *others]
+            phones = list(dict.fromkeys(chain.from_iterable(record.phone_values() for record in group)))
+            birthdays = [record.birthday for record in group if record.birthday]
+            birthday = birthdays[0] if birthdays else None
+            dropped = [other.value for other in birthdays if other.date != birthday.date]
+            for other in others:
+                self.delete(other.name.value)
+            name = kept.name.value
+            self.add_record(self.record_class.from_trusted(
+                name, phones, birthday and birthday.value, birthday and birthday.date))
+            report.merged.append((name, [other.name.value for other in others]))
+            if dropped:
+                report.birthday_conflicts.append((name, birthday.value, dropped))
+        return report
+
+    def page(self, size, cursor=None, order="name", today=None):
+        """Return (records, next_cursor) for one page of the book.
+
+        order is "name" or "birthday" (next birthday from today onwards,
+        wrapping past year end; contacts without a birthday are skipped).
+        Pass next_cursor back to get the following page; it is None after
+        the last page. Cursors remember the last key seen rather than an
+        offset, so pages stay stable while the book changes.
+        """
+        if cursor is not None:
+            order, *state = decode_cursor(cursor)
+        if order == "name":
+            after = state[0] if cursor is not None else None
+            names = self._name_range(after, size + 1)
+            more, names = len(names) > size, names[:size]
+            next_state = [order, names[-1]] if more else None
+        elif order == "birthday":
+            if cursor is not None:
+                anchor, after = tuple(state[:2]), tuple(state[2:]) or None
+            else:
+                today = today or date.today()
+                anchor, after = (today.month, today.day), None
+            entries = self._birthday_page(anchor, after, size + 1)
+            more, entries = len(entries) > size, entries[:size]
+            names = [name for _, _, name in entries]
+            next_state = [order, *anchor, *entries[-1]] if more else None
+        else:
+            raise ValueError(f"Unknown page order {order!r}")
+        return [self.data[name] for name in names], next_state and encode_cursor(next_state)
+
+    def upcoming_birthdays(self, days, today=None):
+        """Return (date, record) pairs for birthdays within the next days days.
+
+        The window includes today and is answered with range queries over the
+        sorted (month, day) index, one per calendar year it touches.
+        """
+        today = today or date.today()
+        end = today + timedelta(days=days)
+        upcoming = []
+        start = today
+        while start <= end:
+            stop = min(end, date(start.year, 12, 31))
+            stop_key = (stop.month, stop.day + 1)
+            if stop_key == (2, 29) and not isleap(stop.year):
+                stop_key = (2, 30)
+            for month, day, name in self._birthdays_between((start.month, start.day), stop_key):
+                upcoming.append((birthday_in_year(month, day, start.year), self.data[name]))
+            start = stop + timedelta(days=1)
+        return upcoming
+
+    def bulk_import(self, rows, batch_size=IMPORT_BATCH_SIZE, processes=None):
+        """Add (name, phones, birthday) rows and return an ImportReport.
+
+        Rows are validated in batches, fanned out to a process pool when the
+        input spans more than one batch. Invalid rows, existing names and
+        phones owned by other contacts are reported instead of raising.
+        """
+        numbered = ((number, *row) for number, row in enumerate(rows, 1))
+        batches = iter(lambda: list(islice(numbered, batch_size)), [])
+        head = list(islice(batches, 2))
+        if len(head) < 2:
+            processes = 1
+        report = ImportReport()
+        for valid, rejected in validate_batches(chain(head, batches), processes or os.cpu_count() or 1):
+            report.rejected.extend(rejected)
+            for number, name, phones, birthday, birthday_date in valid:
+                if name in self.data:
+                    report.rejected.append((number, (name, phones, birthday), "Contact already exists"))
+                    continue
+                try:
+                    self.add_record(self.record_class.from_trusted(name, phones, birthday, birthday_date))
+                except ValueError as e:
+                    report.rejected.append((number, (name, phones, birthday), str(e)))
+                else:
+                    report.imported += 1
+        report.rejected.sort(key=lambda rejected: rejected[0])
+        return report
+
+    def search(self, query):
+        """Return records whose name or phones contain query, in insertion order.
+
+        Candidates come from the trigram index, which is built on the first
+        search and maintained from then on; queries shorter than a trigram
+        fall back to scanning the whole book.
+        """
+        grams = ngrams(query.lower())
+        if grams:
+            index = self._gram_index()
+            postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            names = sorted(candidates, key=self._order.__getitem__)
+        else:
+            names = self.data
+        return [self.data[name] for name in names if self.data[name].matches(query)]
+
+    def fuzzy_find(self, name, max_distance=None):
+        """Return records whose names are within max_distance edits of name, closest first.
+
+        Names are compared case-insensitively, so a typo such as "Jonh"
+        still finds "John". max_distance defaults to fuzzy_distance(name).
+        Candidates are read from the postings of the rarest fuzzy_grams()
+        of the query: search's trigram index for long queries, and for
+        short ones an index of padded bigrams and name lengths built on the
+        first of them.
+        """
+        if max_distance is None:
+            max_distance = fuzzy_distance(name)
+        name = name.lower()
+        grams = fuzzy_grams(name, max_distance) or []
+        size = len(grams[0]) if grams else 0
+        if size == NGRAM_SIZE:
+            index, lengths = self._gram_index(), None
+        else:
+            index = self._short_gram_index()
+            lengths = [index.get(length, ()) for length in range(len(name) - max_distance, len(name) + max_distance + 1)]
+        postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+        candidates = fuzzy_candidates(postings, len(postings) - size * max_distance, lengths)
+        pairs = ((candidate, self._indexed[candidate][0]) for candidate in candidates)
+        return [self.data[match] for *_, match in rank_fuzzy(name, pairs, max_distance)]
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        """Return up to limit names starting with prefix, in sorted order."""
+        names = self._names.items
+        low = bisect_left(names, prefix)
+        high = bisect_left(names, prefix + PREFIX_END, low)
+        return names[low:min(high, low + limit)]
+
+    def query(self, query):
+        """Return the records matching query (a Query or its text), in insertion order.
+
+        The plan starts from the most selective index, intersects the other
+        indexes that are selective enough and tests the remaining terms on
+        each candidate; explain() shows it.
+        """
+        query = Query(query) if isinstance(query, str) else query
+        names, filters = None, []
+        for action, term, _, fetch in self._plan(query):
+            if action == "scan":
+                names = list(self.data)
+            elif action == "index":
+                names = fetch()
+            elif action == "intersect":
+                keep = set(fetch())
+                names = [name for name in names if name in keep]
+            else:
+                filters.append(term)
+        records = [self.data[name] for name in sorted(names, key=self._order.__getitem__)]
+        return [record for record in records if all(term_matches(term, record) for term in filters)]
+
+    def explain(self, query):
+        query = Query(query) if isinstance(query, str) else query
+        lines = []
+        for step, (action, term, estimate, _) in enumerate(self._plan(query), 1):
+            if action == "scan":
+                lines.append(f"{step}. scan all contacts (~{estimate})")
+            elif action == "filter":
+                lines.append(f"{step}. filter {format_term(term)}")
+            else:
+                lines.append(f"{step}. {action} {format_term(term)} (~{estimate})")
+        return "\n".join(lines)
+
+    def _plan(self, query):
+        """Steps of (action, term, estimated contacts, fetch) for query.
+
+        action is "index" or "scan" for the first step, then "intersect"
+        and finally "filter"; fetch returns the names an index step yields.
+        """
+        paths, residual = [], []
+        for term in query.terms:
+            path = self._access_path(term)
+            if path is None:
+                residual.append(term)
+            else:
+                paths.append((path[0], term, *path[1:]))
+        paths.sort(key=lambda path: path[0])
+        if not paths:
+            return [("scan", None, len(self), None), *(("filter", term, None, None) for term in residual)]
+        size, term, exact, fetch = paths[0]
+        plan = [("index", term, size, fetch)]
+        if not exact:
+            residual.append(term)
+        for estimate, term, exact, fetch in paths[1:]:
+            if estimate > size * INTERSECT_RATIO:
+                residual.append(term)
+                continue
+            plan.append(("intersect", term, estimate, fetch))
+            if not exact:
+                residual.append(term)
+            size = min(size, estimate)
+        return plan + [("filter", term, None, None) for term in residual]
+
+    def _access_path(self, term):
+        """(estimate, exact, fetch) for an index that can answer term, or None.
+
+        Inexact paths return a superset of the matches, so their term is
+        still tested on each candidate.
+        """
+        field, op, value = term
+        if field == "month":
+            birthdays = self._birthdays.items
+            low = bisect_left(birthdays, (value,))
+            high = bisect_left(birthdays, (value + 1,))
+            return high - low, True, lambda: [name for _, _, name in birthdays[low:high]]
+        if field == "name" and op == "=":
+            return int(value in self.data), True, lambda: [value] if value in self.data else []
+        if field == "name" and op == "^":
+            names = self._names.items
+            low = bisect_left(names, value)
+            high = bisect_left(names, value + PREFIX_END, low)
+            return high - low, True, lambda: names[low:high]
+        if field == "phone" and op == "=":
+            owners = self._phones.get(value, [])
+            return len(owners), True, lambda: list(owners)
+        grams = ngrams(value.lower())
+        if not grams:
+            return None
+        index = self._gram_index()
+        postings = sorted((index.get(gram, ()) for gram in grams), key=len)
+        return len(postings[0]), False, lambda: set(postings[0]).intersection(*postings[1:])
+
+    def _writing(self):
+        return nullcontext()
+
+    def _empty_copy(self):
+        return AddressBook(unique_phones=self.unique_phones, record_class=self.record_class)
+
+    def _birthdays_between(self, low, high):
+        birthdays = self._birthdays.items
+        return birthdays[bisect_left(birthdays, low):bisect_left(birthdays, high)]
+
+    def _birthday_page(self, anchor, after, limit):
+        # Birthday order runs from anchor to the end of the year, then wraps
+        # round to the entries before anchor.
+        if after is None or after >= anchor:
+            entries = self._birthday_range(after or anchor, None, limit)
+            if len(entries) < limit:
+                entries += self._birthday_range(None, anchor, limit - len(entries))
+            return entries
+        return self._birthday_range(after, anchor, limit)
+
+    def _birthday_range(self, after, before, limit):
+        """Up to limit (month, day, name) entries above after and below before.
+
+        A 2-tuple after bound is inclusive of that whole day.
+        """
+        birthdays = self._birthdays.items
+        low = bisect_right(birthdays, after) if after else 0
+        high = bisect_left(birthdays, before) if before else len(birthdays)
+        return birthdays[low:min(high, low + limit)]
+
+    def _name_range(self, after, limit):
+        names = self._names.items
+        low = bisect_right(names, after) if after is not None else 0
+        return names[low:low + limit]
+
+    def _check_phone(self, name, phone):
+        owners = self._phones.get(phone)
+        if self.unique_phones and owners and owners[0] != name:
+            raise ValueError(f"Phone number {phone} already belongs to {owners[0]}")
+
+    def _reindex(self, record):
+        name = record.name.value
+        texts = (name.lower(), *record.phone_values())
+        self._update_indexes(name, self._indexed.get(name, ()), texts)
+        self._indexed[name] = texts
+        birthday = record.birthday.date if record.birthday else None
+        self._update_birthday(name, (birthday.month, birthday.day) if birthday else None)
+        self._log("put", name, record)
+
+    def _log(self, op, name, record=None):
+        self.version += 1
+        if self.autosaver is not None:
+            self.autosaver.changed(name)
+        if self.journal is not None:
+            self.journal.append([op, name, record_to_dict(record)] if record is not None else [op, name])
+            if self.journal.entries >= self.journal.threshold:
+                self.journal.compact(self)
+
+    def _gram_index(self):
+        if self._grams is None:
+            # Built aside and published whole, so concurrent readers never see it partly filled.
+            grams = defaultdict(set)
+            for name, texts in self._indexed.items():
+                for gram in index_grams(texts):
+                    grams[gram].add(name)
+            self._grams = grams
+        return self._grams
+
+    def _short_gram_index(self):
+        if self._short_grams is None:
+            grams = defaultdict(set)
+            for name, texts in self._indexed.items():
+                for key in short_name_keys(texts):
+                    grams[key].add(name)
+            self._short_grams = grams
+        return self._short_grams
+
+    def _load_rows(self, rows):
+        """Fill an empty book from validated (name, phones, birthday, birthday date) rows.
+
+        A repeated name replaces the earlier contact in its place, as
+        add_record would; the indexes are then built in one pass.
+        """
+        for name, phones, birthday, birthday_date in rows:
+            record = self.record_class.from_trusted(name, phones, birthday, birthday_date)
+            record._book = self
+            self.data[name] = record
+        self._index_rows((name, record.phone_values(), record.birthday and record.birthday.date)
+                         for name, record in self.data.items())
+
+    def _index_rows(self, rows):
+        """Fill the empty indexes from (name, phones, birthday date or None) rows in one pass.
+
+        Does what _reindex does for each row, without diffing against old
+        entries; the trigram postings are left to be built on first use.
+        """
+        order, indexed, owners_by_phone = self._order, self._indexed, self._phones
+        birthdays = []
+        for (name, phones, birthday), position in zip(rows, self._sequence):
+            order[name] = position
+            indexed[name] = (name.lower(), *phones)
+            for phone in phones:
+                owners = owners_by_phone.get(phone)
+                if owners is None:
+                    owners_by_phone[phone] = [name]
+                elif name not in owners:
+                    owners.append(name)
+                    self._shared_phones.add(phone)
+            if birthday:
+                self._birthday_keys[name] = key = (birthday.month, birthday.day)
+                birthdays.append((*key, name))
+        self._names = LazySortedList(order)
+        self._birthdays = LazySortedList(birthdays)
+
+    def _update_birthday(self, name, key):
+        old_key = self._birthday_keys.pop(name, None)
+        if old_key == key:
+            if key is not None:
+                self._birthday_keys[name] = key
+            return
+        if old_key is not None:
+            self._birthdays.remove((*old_key, name))
+        if key is not None:
+            self._birthdays.add((*key, name))
+            self._birthday_keys[name] = key
+
+    def _update_indexes(self, name, old_texts, new_texts):
+        old_phones, new_phones = set(old_texts[1:]), set(new_texts[1:])
+        for phone in old_phones - new_phones:
+            owners = self._phones[phone]
+            owners.remove(name)
+            if len(owners) < 2:
+                self._shared_phones.discard(phone)
+            if not owners:
+                del self._phones[phone]
+        for phone in new_phones - old_phones:
+            owners = self._phones.setdefault(phone, [])
+            owners.append(name)
+            if len(owners) > 1:
+                self._shared_phones.add(phone)
+
+        for index, keys in ((self._grams, index_grams), (self._short_grams, short_name_keys)):
+            if index is None:
+                continue
+            old = keys(old_texts) if old_texts else set()
+            new = keys(new_texts) if new_texts else set()
+            for key in old - new:
+                postings = index[key]
+                postings.discard(name)
+                if not postings:
+                    del index[key]
+            for key in new - old:
+                index[key].add(name)
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers.
+
+    The writer may re-enter both reading() and writing() from its own thread,
+    and a reader may re-enter reading(): nested reads never wait, or they
+    would deadlock behind a writer that is waiting for the outer read.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def reading(self):
+        me = threading.get_ident()
+        depth = getattr(self._local, "reads", 0)
+        # Only the outermost read of a thread that is not the writer counts as a reader.
+        outer = self._writer != me and not depth
+        if outer:
+            with self._condition:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+        self._local.reads = depth + 1
+        try:
+            yield
+        finally:
+            self._local.reads = depth
+            if outer:
+                with self._condition:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._condition.notify_all()
+
+    @contextmanager
+    def writing(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._condition.notify_all()
+
+
+def reading(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.reading():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def writing(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.writing():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ConcurrentAddressBook(AddressBook):
+    """AddressBook that can be shared between threads.
+
+    Lookups, searches and paging take a shared read lock and run side by
+    side; add_record, delete and the phone edits of member records take the
+    write lock, so indexes never show a half-applied change. Iteration and
+    values()/items() work on copies taken under the read lock, and snapshot()
+    copies the book under the read lock so save_contacts encodes and writes
+    the file without holding writers back.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = ReadWriteLock()
+        super().__init__(*args, **kwargs)
+
+    __getitem__ = reading(AddressBook.__getitem__)
+    __contains__ = reading(AddressBook.__contains__)
+    __len__ = reading(AddressBook.__len__)
+    __setitem__ = writing(AddressBook.__setitem__)
+    __delitem__ = writing(AddressBook.__delitem__)
+    # The MutableMapping helpers combine several lookups, so each runs under one lock.
+    get = reading(AddressBook.get)
+    pop = writing(AddressBook.pop)
+    popitem = writing(AddressBook.popitem)
+    setdefault = writing(AddressBook.setdefault)
+    update = writing(AddressBook.update)
+    clear = writing(AddressBook.clear)
+    find = reading(AddressBook.find)
+    delete = writing(AddressBook.delete)
+    find_by_phone = reading(AddressBook.find_by_phone)
+    duplicate_phones = reading(AddressBook.duplicate_phones)
+    page = reading(AddressBook.page)
+    upcoming_birthdays = reading(AddressBook.upcoming_birthdays)
+    search = reading(AddressBook.search)
+    fuzzy_find = reading(AddressBook.fuzzy_find)
+    complete = reading(AddressBook.complete)
+    query = reading(AddressBook.query)
+    find_duplicates = reading(AddressBook.find_duplicates)
+    merge_duplicates = writing(AddressBook.merge_duplicates)
+    explain = reading(AddressBook.explain)
+    snapshot = reading(AddressBook.snapshot)
+
+    @reading
+    def __iter__(self):
+        return iter(list(self.data))
+
+    @reading
+    def keys(self):
+        return list(self.data)
+
+    @reading
+    def values(self):
+        return list(self.data.values())
+
+    @reading
+    def items(self):
+        return list(self.data.items())
+
+    @reading
+    def rows(self):
+        return list(AddressBook.rows(self))
+
+    def iterator(self, n):
+        records = self.values()
+        for i in range(0, len(records), n):
+            yield records[i:i + n]
+
+    def _writing(self):
+        return self._lock.writing()
+
+    def _empty_copy(self):
+        return ConcurrentAddressBook(unique_phones=self.unique_phones, record_class=self.record_class)
+
+
+def record_from_dict(name, data, record_class=Record):
+    record = record_class(name, data.get('birthday'))
+    for phone in data.get('phones', []):
+        record.add_phone(phone)
+    return record
+
+
+def record_to_dict(record):
+    return {"phones": record.phone_values(),
+            "birthday": record.birthday.value if record.birthday else None}
+
+
+class JSONStream:
+    """Incremental reader for one JSON document, decoded value by value.
+
+    Only the unparsed tail of the file is buffered, so memory is bounded by
+    the largest single value rather than the size of the document.
+    """
+
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, file, chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def peek(self):
+        self._skip_whitespace()
+        return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def decode(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value that ends exactly at the buffer edge may continue in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _skip_whitespace(self):
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self._fill()
+
+    def _fill(self):
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+
+
+def iter_contacts(filename, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield (name, data) pairs from a JSON contacts file one contact at a time."""
+    with open(filename, 'r') as file:
+        stream = JSONStream(file, chunk_size)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            name = stream.decode()
+            stream.expect(':')
+            yield name, stream.decode()
+            if stream.expect(',}') == '}':
+                return
+
+
+def iter_records(filename, chunk_size=STREAM_CHUNK_SIZE, record_class=Record):
+    for name, data in iter_contacts(filename, chunk_size):
+        yield record_from_dict(name, data, record_class)
+
+
+@contextmanager
+def paused_gc():
+    """Pause the cycle collector while a load allocates millions of containers.
+
+    None of them is garbage yet, so the collections they would trigger only
+    cost time; pausing makes large loads several times faster.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def contact_batches(filename, batch_size=IMPORT_BATCH_SIZE):
+    """Yield validate_rows' (valid, rejected) for each batch_size contacts of a JSON contacts file.
+
+    Only one batch of rows is held at a time. A missing file yields nothing.
+    """
+    rows = ((number, name, data.get("phones", []), data.get("birthday"))
+            for number, (name, data) in enumerate(iter_contacts(filename), 1))
+    try:
+        for batch in iter(lambda: list(islice(rows, batch_size)), []):
+            yield validate_rows(batch)
+    except FileNotFoundError:
+        return
+
+
+def read_contacts(filename):
+    """Parse and validate a JSON contacts file into validate_rows' (valid, rejected) lists.
+
+    A missing file reads as empty. Kept at module level for worker processes.
+    """
+    valid, rejected = [], []
+    for batch_valid, batch_rejected in contact_batches(filename):
+        valid += batch_valid
+        rejected += batch_rejected
+    return valid, rejected
+
+
+def load_rows(filename, batch_size=IMPORT_BATCH_SIZE):
+    """Yield _load_rows' (name, phones, birthday, birthday date) rows of a JSON contacts file.
+
+    Contacts are validated a batch at a time as the rows are consumed, and
+    the first invalid one raises ValueError.
+    """
+    for valid, rejected in contact_batches(filename, batch_size):
+        if rejected:
+            _, (name, _, _), reason = rejected[0]
+            raise ValueError(f"{filename}: contact {name!r}: {reason}")
+        for _, *row in valid:
+            yield row
+
+
+def load_contacts(filename, record_class=Record, cache=False):
+    """Load a JSON contacts file and replay its journal.
+
+    With cache set, a book pickled next to the file by write_cache() is
+    used instead while the file is unchanged, skipping parsing and
+    validation; the journal is replayed on top either way. Loading never
+    writes the cache, so read-only tools leave nothing behind: the
+    interactive session refreshes it when it saves on exit.
+    """
+    key = cache_key(filename, record_class) if cache else None
+    address_book = read_cache(filename, key) if key else None
+    if address_book is None:
+        with paused_gc():
+            # Rows go in without the per-change checks, so phones already
+            # shared on disk load as they are.
+            address_book = AddressBook(record_class=record_class)
+            address_book._load_rows(load_rows(filename))
+    address_book.cached = cache
+    Journal(filename).replay(address_book)
+    return address_book
+
+
+def cache_key(filename, record_class=Record):
+    """Identify the exact contents of filename, or return None if it does not exist."""
+    digest = hashlib.blake2b()
+    try:
+        with open(filename, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            for chunk in iter(lambda: file.read(STREAM_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return (CACHE_VERSION, os.path.abspath(filename), stat.st_mtime_ns, stat.st_size, digest.hexdigest(),
+            f"{record_class.__module__}.{record_class.__qualname__}")
+
+
+def read_cache(filename, key):
+    """Return the book cached for filename if it was made from the contents key describes.
+
+    The cache is a pickle written by this program next to the contacts file,
+    so it is trusted like the contacts file itself.
+    """
+    try:
+        with open(filename + CACHE_SUFFIX, 'rb') as file:
+            if pickle.load(file) != key:
+                return None
+            with paused_gc():
+                return pickle.load(file)
+    except (OSError, EOFError, pickle.PickleError, AttributeError, ValueError):
+        return None
+
+
+def write_cache(address_book, filename):
+    """Pickle the book next to filename, whose contents it must match, unless that is done already."""
+    key = cache_key(filename, address_book.record_class)
+    if key is None or stored_cache_key(filename) == key:
+        return
+    with open(filename + CACHE_SUFFIX + '.tmp', 'wb') as file:
+        pickle.dump(key, file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(address_book, file, pickle.HIGHEST_PROTOCOL)
+    os.replace(filename + CACHE_SUFFIX + '.tmp', filename + CACHE_SUFFIX)
+
+
+def stored_cache_key(filename):
+    try:
+        with open(filename + CACHE_SUFFIX, 'rb') as file:
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.PickleError, AttributeError, ValueError):
+        return None
+
+
+def write_contacts(data, filename):
+    with open(filename + '.tmp', 'w') as file:
+        json.dump(data, file)
+    os.replace(filename + '.tmp', filename)
+
+
+def save_contacts(address_book, filename, binary=False):
+    """Write the book as JSON, or as a memory-mapped binary snapshot when binary is set."""
+    if binary:
+        # snapshot_book builds on this module, so it is imported only when needed.
+        from snapshot_book import write_snapshot
+        write_snapshot(address_book.rows(), filename)
+    else:
+        write_contacts(address_book.snapshot(), filename)
+
+
+def encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid page cursor") from None
+    if not isinstance(state, list) or not state:
+        raise ValueError("Invalid page cursor")
+    return state
+
+
+class MergeReport:
+    def __init__(self):
+        self.merged = []
+        self.birthday_conflicts = []
+
+    def __str__(self):
+        lines = [f"Merged {sum(len(names) for _, names in self.merged)} duplicate contacts "
+                 f"into {len(self.merged)}"]
+        lines.extend(f"{kept} <- {', '.join(names)}" for kept, names in self.merged)
+        lines.extend(f"{kept}: kept birthday {birthday}, dropped {', '.join(dropped)}"
+                     for kept, birthday, dropped in self.birthday_conflicts)
+        return "\n".join(lines)
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []
+
+    def __str__(self):
+        lines = [f"Imported {self.imported} contacts, rejected {len(self.rejected)}"]
+        lines.extend(f"row {number}: {reason}" for number, _, reason in self.rejected)
+        return "\n".join(lines)
+
+
+def validate_rows(rows):
+    """Validate a batch of (number, name, phones, birthday) import rows.
+
+    Returns (valid, rejected); valid rows gain the parsed birthday date.
+    Kept at module level so batches can be sent to worker processes.
+    """
+    valid, rejected = [], []
+    is_phone = PHONE_PATTERN.fullmatch
+    for number, name, phones, birthday in rows:
+        row = (name, phones, birthday)
+        bad_phone = next((phone for phone in phones if not isinstance(phone, str) or not is_phone(phone)), None)
+        birthday_date = parse_birthday(birthday) if isinstance(birthday, str) and birthday else None
+        if not name:
+            rejected.append((number, row, "Missing name"))
+        elif bad_phone is not None:
+            rejected.append((number, row, f"Invalid phone number {bad_phone!r}"))
+        elif birthday and birthday_date is None:
+            rejected.append((number, row, f"Invalid birthday {birthday!r}"))
+        else:
+            valid.append((number, name, phones, birthday or None, birthday_date))
+    return valid, rejected
+
+
+def validate_batches(batches, processes):
+    """Yield validate_rows results in order, keeping at most 2 * processes batches in flight."""
+    if processes <= 1:
+        yield from map(validate_rows, batches)
+        return
+    with ProcessPoolExecutor(processes) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(validate_rows, batch))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_csv(filename):
+    """Yield (name, phones, birthday) rows from a CSV file.
+
+    Expects a header with name, phones (or phone) and birthday columns;
+    several phones in one cell are separated by ';'.
+    """
+    with open(filename, newline='') as file:
+        for row in csv.DictReader(file):
+            phones = row.get('phones') or row.get('phone') or ''
+            yield ((row.get('name') or '').strip(),
+                   [phone.strip() for phone in phones.split(';') if phone.strip()],
+                   (row.get('birthday') or '').strip() or None)
+
+
+def read_vcard(filename):
+    """Yield (name, phones, birthday) rows from a vCard file, one per card.
+
+    Spaces, dashes, dots and brackets are dropped from TEL values; BDAY
+    accepts both YYYY-MM-DD and YYYYMMDD.
+    """
+    name, phones, birthday = "", [], None
+    with open(filename, 'r') as file:
+        for line in unfold_lines(file):
+            key, _, value = line.partition(":")
+            prop = key.split(";")[0].rsplit(".", 1)[-1].upper()
+            if prop == "BEGIN":
+                name, phones, birthday = "", [], None
+            elif prop == "FN":
+                name = value.strip()
+            elif prop == "TEL":
+                phones.append(re.sub(r'[\s().-]', '', value))
+            elif prop == "BDAY":
+                birthday = value.strip()
+                if re.fullmatch(r'\d{8}', birthday):
+                    birthday = f"{birthday[:4]}-{birthday[4:6]}-{birthday[6:]}"
+            elif prop == "END":
+                yield name, phones, birthday
+
+
+def unfold_lines(file):
+    """Join vCard continuation lines (starting with a space or tab) onto the previous line."""
+    pending = None
+    for line in file:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+class Journal:
+    """Append-only log of book mutations kept next to the snapshot file.
+
+    Every change is written as one JSON line: ["put", name, record] or
+    ["delete", name]. load_contacts replays the log over the snapshot, and
+    compact() folds it back into a fresh snapshot.
+    """
+
+    def __init__(self, filename, threshold=COMPACT_THRESHOLD, fsync=False):
+        self.filename = filename
+        self.path = filename + JOURNAL_SUFFIX
+        self.threshold = threshold
+        self.fsync = fsync
+        self.entries = 0
+        self._file = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                self.entries = sum(1 for _ in file)
+
+    def append(self, entry):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.entries += 1
+
+    def replay(self, address_book):
+        """Apply the log to address_book and cut off a torn write at its tail.
+
+        A crash can leave the last line unfinished. It is dropped, and the
+        file is truncated after the last complete line so that the next
+        append starts a line of its own instead of extending the torn one.
+        """
+        good, entries = 0, 0
+        try:
+            with open(self.path, 'rb') as file, address_book.allowing_shared_phones():
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        op, name, *record = json.loads(line)
+                    except ValueError:
+                        break
+                    if op == "put":
+                        address_book.add_record(record_from_dict(name, record[0], address_book.record_class))
+                    elif op == "delete":
+                        address_book.delete(name)
+                    good += len(line)
+                    entries += 1
+            if good < os.path.getsize(self.path):
+                with open(self.path, 'r+b') as file:
+                    file.truncate(good)
+        except FileNotFoundError:
+            pass
+        self.entries = entries
+
+    def compact(self, address_book):
+        save_contacts(address_book, self.filename)
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.entries = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Autosaver:
+    """Background thread that keeps a JSON book's file up to date.
+
+    The book reports every changed name, and the autosaver takes over from
+    its journal. Each contact is kept as an encoded JSON fragment, so a
+    flush re-encodes only the contacts changed since the previous one, then
+    writes the joined fragments to a temporary file and renames it over the
+    original. Flushes run every interval seconds, or as soon as max_changes
+    contacts are waiting; close() flushes whatever is left.
+    """
+
+    def __init__(self, address_book, filename, interval=AUTOSAVE_INTERVAL, max_changes=AUTOSAVE_CHANGES):
+        self.address_book = address_book
+        self.filename = filename
+        self.interval = interval
+        self.max_changes = max_changes
+        self.flushes = 0
+        self._fragments = None
+        self._dirty = set()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        # Kept until the first flush, which folds any pending entries into the file.
+        self._journal, address_book.journal = address_book.journal, None
+        address_book.autosaver = self
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def changed(self, name):
+        with self._condition:
+            self._dirty.add(name)
+            if len(self._dirty) >= self.max_changes:
+                self._condition.notify()
+
+    def flush(self):
+        """Write the file if anything changed since the last flush; return whether it was written."""
+        with self._flush_lock:
+            with self._condition:
+                dirty, self._dirty = self._dirty, set()
+            pending_journal = self._journal is not None and self._journal.entries > 0
+            if not dirty and not pending_journal:
+                return False
+            data = self.address_book.data
+            if self._fragments is None:
+                self._fragments, dirty = {}, list(data)
+            for name in dirty:
+                record = data.get(name)
+                if record is None:
+                    self._fragments.pop(name, None)
+                else:
+                    self._fragments[name] = f"{json.dumps(name)}: {json.dumps(record_to_dict(record))}"
+            try:
+                with open(self.filename + '.tmp', 'w') as file:
+                    file.write("{" + ", ".join(self._fragments.values()) + "}")
+                os.replace(self.filename + '.tmp', self.filename)
+            except OSError:
+                with self._condition:
+                    self._dirty.update(dirty)
+                raise
+            if self._journal is not None:
+                self._journal.close()
+                if os.path.exists(self._journal.path):
+                    os.remove(self._journal.path)
+                self._journal = None
+            self.flushes += 1
+            return True
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.address_book.autosaver = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or len(self._dirty) >= self.max_changes,
+                                         self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Autosave to {self.filename} failed: {e}", file=sys.stderr)
@@ -0,0 +1,138 @@
+"""
+Reports over an address book computed on columnar arrays.
+
+The book is exported once into typed columns: every phone as a 64-bit
+integer with the index of its contact, and every birthday as year, month
+and day. Each report is then a vectorised pass over those columns, with
+NumPy when it is installed and the array module plus collections.Counter
+otherwise:
+
+    python analytics.py --file contacts.db
+    python analytics.py --file contacts.db --json --bucket 5
+"""
+
+import argparse
+from array import array
+from calendar import isleap, month_name
+from collections import Counter
+from datetime import date
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import main
+
+
+# Phones are 10 digits, so dividing by this leaves the 3-digit operator prefix.
+PREFIX_DIVISOR = 10 ** 7
+AGE_BUCKET = 10
+
+
+class Columns:
+    """Phones and birthdays of a book as typed arrays, each value converted once."""
+
+    def __init__(self, phones, owners, years, months, days):
+        self.phones = phones
+        self.owners = owners
+        self.years = years
+        self.months = months
+        self.days = days
+
+    @classmethod
+    def from_book(cls, address_book):
+        phones, owners = array('Q'), array('I')
+        years, months, days = array('H'), array('B'), array('B')
+        for index, record in enumerate(address_book.values()):
+            numbers = record.phone_values()
+            phones.extend(map(int, numbers))
+            owners.extend([index] * len(numbers))
+            if record.birthday is not None:
+                birthday = record.birthday.date
+                years.append(birthday.year)
+                months.append(birthday.month)
+                days.append(birthday.day)
+        columns = (phones, owners, years, months, days)
+        if numpy is not None:
+            columns = (numpy.frombuffer(column, dtype=column.typecode) for column in columns)
+        return cls(*columns)
+
+
+def operator_prefixes(columns):
+    """Number of contacts with at least one phone per operator prefix, as {"050": count}."""
+    if numpy is not None:
+        prefixes = (columns.phones // PREFIX_DIVISOR).astype(numpy.int64)
+        pairs = numpy.unique(columns.owners.astype(numpy.int64) * 1000 + prefixes)
+        counts = numpy.bincount(pairs % 1000, minlength=1000)
+        return {f"{prefix:03d}": int(counts[prefix]) for prefix in numpy.flatnonzero(counts)}
+    pairs = set(zip(columns.owners, (phone // PREFIX_DIVISOR for phone in columns.phones)))
+    counts = Counter(prefix for _, prefix in pairs)
+    return {f"{prefix:03d}": counts[prefix] for prefix in sorted(counts)}
+
+
+def birthdays_per_month(columns):
+    """Birthdays in each month, January first."""
+    if numpy is not None:
+        return [int(count) for count in numpy.bincount(columns.months, minlength=13)[1:]]
+    counts = Counter(columns.months)
+    return [counts[month] for month in range(1, 13)]
+
+
+def age_distribution(columns, today=None, bucket=AGE_BUCKET):
+    """Contacts per age bracket, as {first age of the bracket: count}.
+
+    Ages are as of today; Feb 29 birthdays count from Feb 28 in common
+    years, as in the rest of the book. Birthdays in the future are left out.
+    """
+    today = today or date.today()
+    today_key = today.month * 100 + today.day
+    leap = isleap(today.year)
+    if numpy is not None:
+        keys = columns.months.astype(numpy.int32) * 100 + columns.days
+        if not leap:
+            keys = numpy.where(keys == 229, 228, keys)
+        ages = today.year - columns.years.astype(numpy.int32) - (keys > today_key)
+        brackets, counts = numpy.unique(ages[ages >= 0] // bucket * bucket, return_counts=True)
+        return {int(bracket): int(count) for bracket, count in zip(brackets, counts)}
+    counts = Counter()
+    for year, month, day in zip(columns.years, columns.months, columns.days):
+        key = 228 if (month, day, leap) == (2, 29, False) else month * 100 + day
+        age = today.year - year - (key > today_key)
+        if age >= 0:
+            counts[age // bucket * bucket] += 1
+    return dict(sorted(counts.items()))
+
+
+def report(address_book, today=None, bucket=AGE_BUCKET):
+    columns = Columns.from_book(address_book)
+    return {
+        "operator_prefixes": operator_prefixes(columns),
+        "birthdays_per_month": dict(zip(month_name[1:], birthdays_per_month(columns))),
+        "age_distribution": {f"{age}-{age + bucket - 1}": count
+                             for age, count in age_distribution(columns, today, bucket).items()},
+    }
+
+
+def main_analytics():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="contacts.db", help="contacts file (default: %(default)s)")
+    parser.add_argument("--bucket", type=int, default=AGE_BUCKET, help="years per age bracket (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args()
+
+    results = report(main.open_book(args.file), bucket=args.bucket)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    titles = {"operator_prefixes": "Contacts per operator prefix", "birthdays_per_month": "Birthdays per month",
+              "age_distribution": "Age distribution"}
+    for key, title in titles.items():
+        print(f"{title}:")
+        for label, count in results[key].items():
+            print(f"  {label:<10} {count:>8}")
+
+
+if __name__ == "__main__":
+    main_analytics()
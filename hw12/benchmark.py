@@ -0,0 +1,212 @@
+"""
+Benchmark suite for the address book.
+
+Builds synthetic books of the requested sizes and times load_contacts,
+save_contacts, search_contact (exact matches and the fuzzy "did you mean"
+fallback separately), AddressBook.find, AddressBook.iterator and
+Record.days_to_birthday, plus the memory used per contact by the Record and
+CompactRecord layouts. Results are printed and optionally written as JSON:
+
+    python benchmark.py --sizes 1000,10000,100000 --output results.json
+    python benchmark.py --sizes 100000 --baseline results.json --tolerance 0.2
+
+With --baseline the run is compared against an earlier JSON file and the
+exit status is 1 when any benchmark got slower than the tolerance allows.
+Peak memory is traced only up to --memory-max-size contacts; a million
+contacts take about 2.5 GB and ten million about ten times that.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import addressbook
+import main
+
+
+def synthetic_contacts(size, phones_per_contact):
+    for i in range(size):
+        phones = [f"{(i * phones_per_contact + j) % 10 ** 10:010d}" for j in range(phones_per_contact)]
+        birthday = f"{1950 + i % 60}-{1 + i % 12:02d}-{1 + i % 28:02d}" if i % 2 else None
+        yield f"contact{i}", phones, birthday
+
+
+def build_book(size, phones_per_contact, record_class=addressbook.Record):
+    address_book = addressbook.AddressBook(record_class=record_class)
+    for name, phones, birthday in synthetic_contacts(size, phones_per_contact):
+        record = record_class(name, birthday)
+        for phone in phones:
+            record.add_phone(phone)
+        address_book.add_record(record)
+    return address_book
+
+
+def measure_records(record_class, size, phones_per_contact):
+    tracemalloc.start()
+    records = []
+    for name, phones, birthday in synthetic_contacts(size, phones_per_contact):
+        record = record_class(name, birthday)
+        for phone in phones:
+            record.add_phone(phone)
+        records.append(record)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+def timed(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def book_benchmarks(address_book, size, workdir, rng):
+    """Yield (name, operations, callable, warm_up) for every benchmark on one book size.
+
+    Benchmarks with warm_up set are run once untimed first, so the search
+    indexes they build on first use are not counted in the timed runs.
+    """
+    source = os.path.join(workdir, f"contacts-{size}.db")
+    target = os.path.join(workdir, f"saved-{size}.db")
+    addressbook.save_contacts(address_book, source)
+    names = [f"contact{rng.randrange(size)}" for _ in range(1000)]
+    queries = ["contact1", "act12", "00001"]
+    # No exact match for any of these, so each one takes the fuzzy fallback.
+    misspelled = ["contatc1", "kontact42", "contac7x"]
+    records = list(address_book.values())
+
+    yield "load_contacts", 1, lambda: addressbook.load_contacts(source), False
+    yield "save_contacts", 1, lambda: addressbook.save_contacts(address_book, target), False
+    yield ("search_contact", len(queries),
+           lambda: [main.search_contact(address_book, query) for query in queries], True)
+    yield ("search_fuzzy", len(misspelled),
+           lambda: [main.search_contact(address_book, query) for query in misspelled], True)
+    yield "find", len(names), lambda: [address_book.find(name) for name in names], False
+    yield "iterator", 1, lambda: sum(1 for _ in address_book.iterator(100)), False
+    yield "days_to_birthday", len(records), lambda: [record.days_to_birthday() for record in records], False
+
+
+def run_suite(sizes, phones_per_contact, repeat, memory_max_size):
+    # Time the searches themselves rather than replies served from the result cache.
+    main.RESULTS.limit = 0
+    rng = random.Random(0)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            address_book = build_book(size, phones_per_contact)
+            for name, operations, func, warm_up in book_benchmarks(address_book, size, workdir, rng):
+                if warm_up:
+                    func()
+                durations = timed(func, repeat)
+                result = {
+                    "size": size,
+                    "benchmark": name,
+                    "operations": operations,
+                    "median_seconds": statistics.median(durations),
+                    "min_seconds": min(durations),
+                    "per_operation_us": statistics.median(durations) / operations * 1e6,
+                }
+                if size <= memory_max_size:
+                    result["peak_bytes"] = peak_memory(func)
+                results.append(result)
+                report(result)
+    return results
+
+
+def run_layouts(size, phones_per_contact):
+    layouts = []
+    for record_class in (addressbook.Record, addressbook.CompactRecord):
+        used = measure_records(record_class, size, phones_per_contact)
+        layouts.append({"layout": record_class.__name__, "size": size,
+                        "bytes": used, "bytes_per_contact": used / size})
+    baseline = layouts[0]["bytes"]
+    for layout in layouts:
+        print(f"{layout['layout']:<14} {layout['bytes'] / 2 ** 20:9.1f} MiB  "
+              f"{layout['bytes_per_contact']:7.1f} B/contact  {layout['bytes'] / baseline:6.1%} of Record")
+    return layouts
+
+
+def report(result):
+    line = (f"{result['size']:>10} {result['benchmark']:<18} {result['median_seconds'] * 1e3:10.2f} ms"
+            f" {result['per_operation_us']:12.2f} us/op")
+    if "peak_bytes" in result:
+        line += f" {result['peak_bytes'] / 2 ** 20:9.1f} MiB peak"
+    print(line)
+
+
+def compare(results, baseline_file, tolerance):
+    """Print the slowdown against a previous run and return the regressed benchmarks."""
+    with open(baseline_file, 'r') as file:
+        baseline = {(r["size"], r["benchmark"]): r for r in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["size"], result["benchmark"]))
+        if previous is None:
+            continue
+        ratio = result["median_seconds"] / previous["median_seconds"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{result['size']:>10} {result['benchmark']:<18} {ratio:6.2f}x {flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated book sizes, e.g. 1000,1000000 (default: %(default)s)")
+    parser.add_argument("--phones", type=int, default=2, help="phones per contact (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    # tracemalloc keeps a trace of every live allocation, which at a million
+    # contacts takes more memory than the books themselves.
+    parser.add_argument("--memory-max-size", type=int, default=100_000,
+                        help="largest size to run the peak-memory pass on (default: %(default)s)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against an earlier JSON results file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default: %(default)s)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = run_suite(sizes, args.phones, args.repeat, -1 if args.no_memory else args.memory_max_size)
+    layouts = run_layouts(min(sizes), args.phones)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                "meta": {
+                    "timestamp": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "phones_per_contact": args.phones,
+                    "repeat": args.repeat,
+                },
+                "results": results,
+                "layouts": layouts,
+            }, file, indent=2)
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_benchmark()
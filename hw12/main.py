@@ -1,232 +1,519 @@
-from collections import UserDict
-import re
-from datetime import datetime
-import json
-
-
-class Field:
-    def __init__(self, value=None):
-        self.__value = value
-
-    @property
-    def value(self):
-        return self.__value
-
-    @value.setter
-    def value(self, new_value):
-        self.__value = new_value
-
-    def __str__(self):
-        return str(self.__value)
-
-
-class Name(Field):
-    pass
-
-
-class Phone(Field):
-    def __init__(self, value):
-        super().__init__(value)
-        self.value = value
-
-    @Field.value.setter
-    def value(self, new_value):
-        if not self.validate(new_value):
-            raise ValueError("Phone number must be 10 digits")
-        self._Field__value = new_value
-
-    @staticmethod
-    def validate(phone):
-        return re.fullmatch(r'\d{10}', phone) is not None
-
-
-class Birthday(Field):
-    @Field.value.setter
-    def value(self, new_value):
-        if not self.validate(new_value):
-            raise ValueError("Birthday must be in YYYY-MM-DD format")
-        self._Field__value = new_value
-
-    @staticmethod
-    def validate(birthday):
-        try:
-            datetime.strptime(birthday, "%Y-%m-%d")
-            return True
-        except ValueError:
-            return False
-
-
-class Record:
-    def __init__(self, name, birthday=None):
-        self.name = Name(name)
-        self.birthday = Birthday(birthday) if birthday else None
-        self.phones = []
-
-    def add_phone(self, phone):
-        self.phones.append(Phone(phone))
-
-    def remove_phone(self, phone):
-        self.phones = [p for p in self.phones if p.value != phone]
-
-    def edit_phone(self, old_phone, new_phone):
-        for phone in self.phones:
-            if phone.value == old_phone:
-                phone.value = new_phone
-                return
-        raise ValueError("Phone number not found")
-
-    def find_phone(self, phone):
-        return next((p for p in self.phones if p.value == phone), None)
-
-    def days_to_birthday(self):
-        if self.birthday.value is None:
-            return None
-        today = datetime.now()
-        birthday_date = datetime.strptime(self.birthday.value, "%Y-%m-%d").replace(year=today.year)
-        if birthday_date < today:
-            birthday_date = birthday_date.replace(year=today.year + 1)
-        return (birthday_date - today).days
-
-    def __str__(self):
-        return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}"
-
-
-class AddressBook(UserDict):
-    def add_record(self, record):
-        self.data[record.name.value] = record
-
-    def find(self, name):
-        return self.data.get(name)
-
-    def delete(self, name):
-        if name in self.data:
-            del self.data[name]
-
-    def iterator(self, n):
-        records = list(self.data.values())
-        for i in range(0, len(records), n):
-            yield records[i:i + n]
-
-
-def load_contacts(filename):
-    try:
-        with open(filename, 'r') as file:
-            data = json.load(file)
-            address_book = AddressBook()
-            for name, record in data.items():
-                new_record = Record(name, record.get('birthday'))
-                for phone in record.get('phones', []):
-                    new_record.add_phone(phone)
-                address_book.add_record(new_record)
-            return address_book
-    except FileNotFoundError:
-        return AddressBook()
-
-
-def save_contacts(address_book, filename):
-    data = {record.name.value: {"phones": [phone.value for phone in record.phones],
-                                "birthday": record.birthday.value if record.birthday else None}
-            for record in address_book.data.values()}
-    with open(filename, 'w') as file:
-        json.dump(data, file)
-
-
-def input_error(handler):
-    def wrapper(*args, **kwargs):
-        try:
-            return handler(*args, **kwargs)
-        except KeyError:
-            return "There is no such contact"
-        except ValueError as e:
-            return str(e)
-        except IndexError:
-            return "Enter user name"
-    return wrapper
-
-
-@input_error
-def add_contact(address_book, name, phone):
-    if not name or not phone:
-        raise ValueError("Give me name and phone please")
-    if address_book.find(name):
-        raise ValueError("Contact already exists")
-    new_record = Record(name)
-    new_record.add_phone(phone)
-    address_book.add_record(new_record)
-    return f"Contact {name} added"
-
-
-@input_error
-def change_contact(address_book, name, phone):
-    if not name or not phone:
-        raise ValueError("Give me name and phone please")
-    record = address_book.find(name)
-    if record is None:
-        raise KeyError
-    record.phones = []
-    record.add_phone(phone)
-    return f"Contact {name} updated"
-
-
-@input_error
-def show_phone(address_book, name):
-    record = address_book.find(name)
-    if record is None:
-        raise KeyError
-    return ', '.join([phone.value for phone in record.phones])
-
-
-@input_error
-def show_all_contacts(address_book):
-    if not address_book:
-        return "Contact list is empty"
-    return "\n".join([str(record) for record in address_book.data.values()])
-
-
-@input_error
-def search_contact(address_book, query):
-    if not query:
-        raise ValueError("Please provide a search query")
-    matching_contacts = []
-    for record in address_book.values():
-        if query.lower() in record.name.value.lower() or any(query in phone.value for phone in record.phones):
-            matching_contacts.append(str(record))
-    if not matching_contacts:
-        return "No matching contacts found"
-    return "\n".join(matching_contacts)
-
-
-def main():
-    filename = 'contacts.db'
-    address_book = load_contacts(filename)
-
-    while True:
-        user_input = input(">").lower()
-        command, *args = user_input.split(maxsplit=1)
-
-        if command == "hello":
-            print("How can I help you?")
-        elif user_input in ["good bye", "close", "exit"]:
-            print("Good bye!")
-            save_contacts(address_book, filename)
-            break
-        elif command == "add":
-            name, phone = (args[0].split() + [None, None])[:2]
-            print(add_contact(address_book, name, phone))
-        elif command == "change":
-            name, phone = (args[0].split() + [None, None])[:2]
-            print(change_contact(address_book, name, phone))
-        elif command == "phone":
-            name = args[0]
-            print(show_phone(address_book, name))
-        elif user_input == "show all":
-            print(show_all_contacts(address_book))
-        elif command == "search":
-            query = args[0] if args else ""
-            print(search_contact(address_book, query))
-        else:
-            print("Unknown command or wrong format")
-
-
-if __name__ == "__main__":
-    main()
+import argparse
+import asyncio
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+import functools
+import os
+try:
+    import readline
+except ImportError:  # not available on Windows
+    readline = None
+import sys
+import threading
+import time
+import weakref
+import json
+
+# Field, Name, Phone, Record and AddressBook stay importable from main, as the homework checks expect.
+from addressbook import (AUTOSAVE_CHANGES, AUTOSAVE_INTERVAL, SHOW_CHUNK_LINES, AddressBook, Autosaver, Field,
+                         Journal, Name, Phone, Query, Record, load_contacts, write_cache)
+from server import SERVER_SAVE_INTERVAL, AddressBookServer
+from sharded_book import ShardedAddressBook
+from snapshot_book import SNAPSHOT_MAGIC, SnapshotAddressBook
+from sqlite_book import SQLITE_HEADER, SQLiteAddressBook
+
+
+RESULT_CACHE_SIZE = 1024
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0)
+
+
+def open_book(filename):
+    """Open filename with the backend matching its format.
+
+    A directory is a sharded book; files are SQLite, a binary snapshot or
+    journaled JSON.
+    """
+    if os.path.isdir(filename):
+        return ShardedAddressBook(filename)
+    try:
+        with open(filename, 'rb') as file:
+            header = file.read(len(SQLITE_HEADER))
+    except FileNotFoundError:
+        header = b""
+    if header == SQLITE_HEADER:
+        return SQLiteAddressBook(filename)
+    if header.startswith(SNAPSHOT_MAGIC):
+        return SnapshotAddressBook(filename)
+    address_book = load_contacts(filename, cache=True)
+    address_book.journal = Journal(filename)
+    return address_book
+
+
+class HandlerStats:
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'buckets', 'errors')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.errors = defaultdict(int)
+
+
+class CommandMetrics:
+    """Call counts, latency histograms and error counts per command handler.
+
+    Filled in by input_error while enabled; when disabled the decorator only
+    pays for one attribute check per call.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.handlers = {}
+
+    def observe(self, handler, seconds, error=None):
+        stats = self.handlers.get(handler)
+        if stats is None:
+            stats = self.handlers[handler] = HandlerStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if error is not None:
+            stats.errors[error] += 1
+
+    def reset(self):
+        self.handlers.clear()
+
+    def to_dict(self):
+        return {handler: {"calls": stats.calls,
+                          "seconds": stats.seconds,
+                          "max_seconds": stats.max_seconds,
+                          "buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], stats.buckets)),
+                          "errors": dict(stats.errors)}
+                for handler, stats in self.handlers.items()}
+
+    def to_prometheus(self):
+        lines = ["# HELP addressbook_command_duration_seconds Time spent in command handlers.",
+                 "# TYPE addressbook_command_duration_seconds histogram"]
+        for handler, stats in self.handlers.items():
+            cumulative = 0
+            for bound, bucket in zip([*map(str, LATENCY_BUCKETS), "+Inf"], stats.buckets):
+                cumulative += bucket
+                lines.append(f'addressbook_command_duration_seconds_bucket{{handler="{handler}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'addressbook_command_duration_seconds_sum{{handler="{handler}"}} {stats.seconds}')
+            lines.append(f'addressbook_command_duration_seconds_count{{handler="{handler}"}} {stats.calls}')
+        lines += ["# HELP addressbook_command_errors_total Command errors by exception type.",
+                  "# TYPE addressbook_command_errors_total counter"]
+        for handler, stats in self.handlers.items():
+            for error, errors in stats.errors.items():
+                lines.append(f'addressbook_command_errors_total{{handler="{handler}",error="{error}"}} {errors}')
+        return "\n".join(lines)
+
+    def __str__(self):
+        if not self.handlers:
+            return "No commands measured yet" if self.enabled else "Metrics are off, enable them with 'stats on'"
+        lines = [f"{'handler':<20} {'calls':>8} {'mean us':>10} {'max us':>10}  errors"]
+        for handler, stats in sorted(self.handlers.items()):
+            errors = ", ".join(f"{error}={count}" for error, count in stats.errors.items()) or "-"
+            lines.append(f"{handler:<20} {stats.calls:>8} {stats.seconds / stats.calls * 1e6:>10.1f} "
+                         f"{stats.max_seconds * 1e6:>10.1f}  {errors}")
+        return "\n".join(lines)
+
+
+METRICS = CommandMetrics()
+
+
+class ResultCache:
+    """Bounded LRU of command replies keyed on (command, normalised query).
+
+    Each entry remembers the book it was computed from and that book's
+    version; add_record, delete and phone edits bump the version, so a
+    stale entry counts as a miss and is recomputed.
+    """
+
+    def __init__(self, limit=RESULT_CACHE_SIZE):
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, address_book, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is address_book and entry[1] == address_book.version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, address_book, key, version, result):
+        with self._lock:
+            self._entries[key] = (weakref.ref(address_book), version, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.limit:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def to_dict(self):
+        return {"size": len(self._entries), "limit": self.limit, "hits": self.hits, "misses": self.misses}
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        rate = f", {self.hits / lookups:.0%} hit rate" if lookups else ""
+        return (f"Result cache: {len(self._entries)} of {self.limit} entries, "
+                f"{self.hits} hits, {self.misses} misses{rate}")
+
+
+RESULTS = ResultCache()
+
+
+def cached_result(normalize=None):
+    """Serve a (address_book, query) handler from RESULTS while the book is unchanged.
+
+    normalize maps a query to its cache key. It may only merge queries the
+    handler answers identically, since the handler still sees the original.
+    """
+    def decorator(handler):
+        command = handler.__name__
+
+        @functools.wraps(handler)
+        def wrapper(address_book, query):
+            if RESULTS.limit <= 0:
+                return handler(address_book, query)
+            key = (command, normalize(query or "") if normalize else query)
+            result = RESULTS.get(address_book, key)
+            if result is None:
+                version = address_book.version
+                result = handler(address_book, query)
+                RESULTS.put(address_book, key, version, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def input_error(handler):
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter() if METRICS.enabled else None
+        error = None
+        try:
+            return handler(*args, **kwargs)
+        except KeyError:
+            error = "KeyError"
+            return "There is no such contact"
+        except ValueError as e:
+            error = "ValueError"
+            return str(e)
+        except IndexError:
+            error = "IndexError"
+            return "Enter user name"
+        except BaseException as e:
+            # Anything else still propagates, but counts as the error it is rather than a success.
+            error = type(e).__name__
+            raise
+        finally:
+            if start is not None:
+                METRICS.observe(name, time.perf_counter() - start, error)
+    return wrapper
+
+
+@input_error
+def add_contact(address_book, name, phone):
+    if not name or not phone:
+        raise ValueError("Give me name and phone please")
+    if address_book.find(name):
+        raise ValueError("Contact already exists")
+    new_record = address_book.record_class(name)
+    new_record.add_phone(phone)
+    address_book.add_record(new_record)
+    return f"Contact {name} added"
+
+
+@input_error
+def change_contact(address_book, name, phone):
+    if not name or not phone:
+        raise ValueError("Give me name and phone please")
+    record = address_book.find(name)
+    if record is None:
+        raise KeyError
+    if record.find_phone(phone) is None:
+        record.add_phone(phone)
+    for old_phone in set(record.phone_values()) - {phone}:
+        record.remove_phone(old_phone)
+    return f"Contact {name} updated"
+
+
+@input_error
+@cached_result()
+def show_phone(address_book, name):
+    if not name:
+        raise IndexError
+    record = address_book.find(name)
+    if record is None:
+        raise KeyError
+    return ', '.join(record.phone_values())
+
+
+@input_error
+def show_all_contacts(address_book):
+    if not address_book:
+        return "Contact list is empty"
+    return "\n".join([str(record) for record in address_book.data.values()])
+
+
+@input_error
+def stream_all_contacts(address_book, page_size=None, out=None, prompt=input):
+    """Write every contact to out as it is formatted instead of building one string.
+
+    Lines are flushed in chunks of SHOW_CHUNK_LINES. With page_size, output
+    pauses after each page until Enter is pressed; "q" stops early.
+    """
+    if page_size is not None and (not str(page_size).isdigit() or int(page_size) == 0):
+        raise ValueError("Page size must be a positive number")
+    page_size = int(page_size) if page_size is not None else None
+    out = out or sys.stdout
+    if not address_book:
+        out.write("Contact list is empty\n")
+        return None
+    chunk = []
+    shown = 0
+    for record in address_book.data.values():
+        if page_size and shown and shown % page_size == 0:
+            write_lines(out, chunk)
+            if prompt("-- more (Enter to continue, q to quit) --").strip().lower() == "q":
+                return None
+        chunk.append(str(record))
+        shown += 1
+        if len(chunk) >= SHOW_CHUNK_LINES:
+            write_lines(out, chunk)
+    write_lines(out, chunk)
+    return None
+
+
+def write_lines(out, lines):
+    if lines:
+        out.write("\n".join(lines) + "\n")
+        out.flush()
+        lines.clear()
+
+
+@input_error
+@cached_result(normalize=str.lower)
+def search_contact(address_book, query):
+    if not query:
+        raise ValueError("Please provide a search query")
+    matching_contacts = [str(record) for record in address_book.search(query)]
+    if not matching_contacts and not query.isdigit():
+        similar = address_book.fuzzy_find(query)
+        if similar:
+            return "\n".join(["No exact matches, did you mean:", *map(str, similar)])
+    if not matching_contacts:
+        return "No matching contacts found"
+    return "\n".join(matching_contacts)
+
+
+@input_error
+def find_contacts(address_book, query):
+    matching_contacts = [str(record) for record in address_book.query(Query(query))]
+    if not matching_contacts:
+        return "No matching contacts found"
+    return "\n".join(matching_contacts)
+
+
+@input_error
+def explain_query(address_book, query):
+    return address_book.explain(Query(query))
+
+
+@input_error
+def show_duplicates(address_book):
+    groups = address_book.find_duplicates()
+    if not groups:
+        return "No duplicate contacts found"
+    return "\n\n".join("\n".join(map(str, group)) for group in groups)
+
+
+EXIT_COMMANDS = ("good bye", "close", "exit")
+MUTATING_COMMANDS = ("add", "change", "merge")
+COMPLETED_COMMANDS = ("phone", "change", "search")
+
+
+def split_name_phone(args):
+    return (args.split() + [None, None])[:2]
+
+
+def show_cache(args):
+    if args == "clear":
+        RESULTS.clear()
+        return "Result cache cleared"
+    if args.isdigit():
+        RESULTS.limit = int(args)
+        RESULTS.clear()
+        return f"Result cache limit set to {RESULTS.limit}"
+    if args == "json":
+        return json.dumps(RESULTS.to_dict())
+    if not args:
+        return str(RESULTS)
+    return "Usage: cache [clear|json|LIMIT]"
+
+
+def show_stats(args):
+    if args in ("on", "off"):
+        METRICS.enabled = args == "on"
+        return f"Metrics {args}"
+    if args == "reset":
+        METRICS.reset()
+        return "Metrics reset"
+    if args == "json":
+        return json.dumps(METRICS.to_dict())
+    if args == "prometheus":
+        return METRICS.to_prometheus()
+    if not args:
+        return str(METRICS)
+    return "Usage: stats [on|off|reset|json|prometheus]"
+
+
+COMMANDS = {
+    "hello": lambda address_book, args: "How can I help you?",
+    "add": lambda address_book, args: add_contact(address_book, *split_name_phone(args)),
+    "change": lambda address_book, args: change_contact(address_book, *split_name_phone(args)),
+    "phone": lambda address_book, args: show_phone(address_book, args),
+    "search": lambda address_book, args: search_contact(address_book, args),
+    "find": lambda address_book, args: find_contacts(address_book, args),
+    "explain": lambda address_book, args: explain_query(address_book, args),
+    "duplicates": lambda address_book, args: show_duplicates(address_book),
+    "merge": lambda address_book, args: str(address_book.merge_duplicates()),
+    "stats": lambda address_book, args: show_stats(args),
+    "cache": lambda address_book, args: show_cache(args),
+}
+
+
+def name_completer(address_book):
+    """readline completer for the contact name after phone, change and search."""
+    matches = []
+
+    def completer(text, state):
+        if state == 0:
+            words = readline.get_line_buffer()[:readline.get_begidx()].split()
+            in_name = len(words) == 1 and words[0] in COMPLETED_COMMANDS
+            matches[:] = address_book.complete(text) if in_name else []
+        return matches[state] + " " if state < len(matches) else None
+    return completer
+
+
+def install_completer(address_book):
+    if readline is None:
+        return
+    readline.set_completer(name_completer(address_book))
+    readline.set_completer_delims(" \t\n")
+    readline.parse_and_bind("tab: complete")
+
+
+def execute(address_book, user_input, out=None, prompt=input):
+    """Run one command line and write its reply to out.
+
+    Returns False when the line asks to leave, True otherwise.
+    """
+    out = out or sys.stdout
+    user_input = user_input.strip()
+    if user_input in EXIT_COMMANDS:
+        out.write("Good bye!\n")
+        return False
+    command, _, args = user_input.partition(" ")
+    args = args.strip()
+    if command == "show" and args.split()[:1] == ["all"]:
+        result = stream_all_contacts(address_book, (args.split()[1:] or [None])[0], out, prompt)
+    elif command in COMMANDS:
+        result = COMMANDS[command](address_book, args)
+    else:
+        result = "Unknown command or wrong format"
+    if result:
+        out.write(f"{result}\n")
+    return True
+
+
+def run_batch(address_book, filename, script, out=None):
+    """Execute every command in script with buffered output, saving once at the end.
+
+    Returns (commands, seconds) for the throughput summary.
+    """
+    out = out or sys.stdout
+    commands = 0
+    start = time.perf_counter()
+    with address_book.deferred_writes(filename):
+        for line in script:
+            if not line.strip():
+                continue
+            commands += 1
+            if not execute(address_book, line.lower(), out, prompt=lambda message: ""):
+                break
+    out.flush()
+    return commands, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Address book assistant")
+    parser.add_argument("--file", default="contacts.db", help="contacts file (default: contacts.db)")
+    parser.add_argument("--batch", metavar="SCRIPT",
+                        help="run the commands in SCRIPT ('-' for stdin) instead of prompting")
+    parser.add_argument("--serve", metavar="[HOST:]PORT", help="serve the commands over TCP instead of prompting")
+    parser.add_argument("--save-interval", type=float, default=SERVER_SAVE_INTERVAL,
+                        help="seconds between server snapshots (default: %(default)s)")
+    parser.add_argument("--metrics", action="store_true", help="measure command latency and errors from the start")
+    parser.add_argument("--cache-size", type=int, default=RESULT_CACHE_SIZE, metavar="N",
+                        help="search and phone replies to keep, 0 to disable (default: %(default)s)")
+    parser.add_argument("--autosave", type=float, default=AUTOSAVE_INTERVAL, metavar="SECONDS",
+                        help="seconds between background saves of a JSON book, 0 to save on exit only "
+                             "(default: %(default)s)")
+    parser.add_argument("--autosave-changes", type=int, default=AUTOSAVE_CHANGES, metavar="N",
+                        help="save early once N contacts have changed (default: %(default)s)")
+    args = parser.parse_args()
+    METRICS.enabled = args.metrics
+    RESULTS.limit = args.cache_size
+    address_book = open_book(args.file)
+
+    if args.serve:
+        host, _, port = args.serve.rpartition(":")
+        server = AddressBookServer(address_book, args.file, execute, MUTATING_COMMANDS, args.save_interval)
+        try:
+            asyncio.run(server.serve(host or "127.0.0.1", int(port)))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.batch:
+        script = sys.stdin if args.batch == "-" else open(args.batch, 'r')
+        with open(sys.stdout.fileno(), 'w', buffering=1 << 20, closefd=False) as out:
+            commands, seconds = run_batch(address_book, args.file, script, out)
+        if script is not sys.stdin:
+            script.close()
+        rate = commands / seconds if seconds else float("inf")
+        print(f"{commands} commands in {seconds:.3f}s ({rate:.0f} commands/s)", file=sys.stderr)
+        return
+
+    install_completer(address_book)
+    autosaver = None
+    if args.autosave > 0 and address_book.journal is not None:
+        autosaver = Autosaver(address_book, args.file, args.autosave, args.autosave_changes)
+    while execute(address_book, input(">").lower()):
+        pass
+    if autosaver is not None:
+        autosaver.close()
+    else:
+        address_book.save(args.file)
+    if address_book.cached:
+        write_cache(address_book, args.file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Serve the address book commands to many clients over TCP with asyncio.
+
+The command layer is passed in by the caller, so this module only deals
+with connections, paging and periodic snapshots.
+"""
+
+import asyncio
+import io
+
+from addressbook import SHOW_CHUNK_LINES
+
+
+SERVER_SAVE_INTERVAL = 30
+SERVER_LINE_LIMIT = 64 * 1024
+
+
+class Session:
+    """One client connection to AddressBookServer.
+
+    Commands are read a line at a time and every reply ends with an empty
+    line. Writes wait on drain(), so a slow reader only stalls its own session.
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.commands = 0
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    line = await self.reader.readline()
+                except ValueError:
+                    await self.send("Command is too long\n")
+                    break
+                if not line:
+                    break
+                user_input = line.decode(errors="replace").strip().lower()
+                if not user_input:
+                    continue
+                self.commands += 1
+                if not await self.execute(user_input):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.writer.close()
+
+    async def execute(self, user_input):
+        address_book = self.server.address_book
+        command, _, args = user_input.partition(" ")
+        if command == "show" and args.split()[:1] == ["all"]:
+            await self.show_all()
+            return True
+        out = io.StringIO()
+        keep_going = self.server.execute(address_book, user_input, out)
+        if command in self.server.mutating_commands:
+            self.server.dirty = True
+        await self.send(out.getvalue())
+        return keep_going
+
+    async def show_all(self):
+        # Page by name with a cursor so other sessions can change the book
+        # while this one waits on a slow client.
+        address_book = self.server.address_book
+        if not address_book:
+            await self.send("Contact list is empty\n")
+            return
+        cursor = None
+        while True:
+            records, cursor = address_book.page(SHOW_CHUNK_LINES, cursor)
+            self.writer.write("".join(f"{record}\n" for record in records).encode())
+            await self.writer.drain()
+            if cursor is None:
+                break
+        await self.send("")
+
+    async def send(self, text):
+        self.writer.write(f"{text}\n".encode())
+        await self.writer.drain()
+
+
+class AddressBookServer:
+    """Serve a command set to many clients over a TCP line protocol.
+
+    execute(address_book, user_input, out) runs one command and returns
+    whether the session goes on; commands in mutating_commands mark the
+    book for the next snapshot. Snapshots are taken on the event loop,
+    where they are consistent, and written to disk in a worker thread.
+    """
+
+    def __init__(self, address_book, filename, execute, mutating_commands, save_interval=SERVER_SAVE_INTERVAL):
+        self.address_book = address_book
+        self.filename = filename
+        self.execute = execute
+        self.mutating_commands = mutating_commands
+        self.save_interval = save_interval
+        self.dirty = False
+        self._save_lock = asyncio.Lock()
+
+    async def serve(self, host, port):
+        if self.address_book.journal is not None:
+            # The server saves whole snapshots; fold and retire the journal first.
+            self.address_book.journal.compact(self.address_book)
+            self.address_book.journal = None
+        server = await asyncio.start_server(self.handle, host, port, limit=SERVER_LINE_LIMIT)
+        autosave = asyncio.create_task(self.autosave())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            autosave.cancel()
+            await self.save()
+
+    async def handle(self, reader, writer):
+        await Session(self, reader, writer).run()
+
+    async def autosave(self):
+        while True:
+            await asyncio.sleep(self.save_interval)
+            await self.save()
+
+    async def save(self):
+        async with self._save_lock:
+            if not self.dirty or self.address_book.writes_through:
+                return
+            self.dirty = False
+            write = self.address_book.snapshot_writer(self.filename)
+            await asyncio.get_running_loop().run_in_executor(None, write)
@@ -0,0 +1,231 @@
+"""
+AddressBook split by name hash over a directory of JSON shard files.
+
+Only the shards that changed are written back, and large books load
+their shards in parallel worker processes.
+"""
+
+from collections import defaultdict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import heapq
+from itertools import chain, islice
+import os
+import re
+import zlib
+
+from addressbook import (COMPLETION_LIMIT, AddressBook, Journal, Query, Record, edit_distance, load_contacts,
+                         read_contacts, write_contacts)
+
+
+SHARD_COUNT = 8
+# Below this many bytes of shard files, starting worker processes costs more than it saves.
+PARALLEL_LOAD_BYTES = 1 << 20
+SHARD_PATTERN = re.compile(r'shard-(\d{3})\.json')
+
+
+def shard_index(name, shards):
+    return zlib.crc32(name.encode()) % shards
+
+
+def shard_path(directory, index):
+    return os.path.join(directory, f"shard-{index:03d}.json")
+
+
+def write_shards(jobs, processes):
+    """Write (data, filename) pairs with write_contacts, in parallel when there are several."""
+    if len(jobs) < 2 or processes < 2:
+        for data, filename in jobs:
+            write_contacts(data, filename)
+        return
+    with ProcessPoolExecutor(min(processes, len(jobs))) as pool:
+        list(pool.map(write_contacts, *zip(*jobs)))
+
+
+class ShardedRecords(MutableMapping):
+    """Name -> Record view over the data of every shard of a ShardedAddressBook."""
+
+    def __init__(self, book):
+        self._book = book
+
+    def __getitem__(self, name):
+        return self._book._shard(name).data[name]
+
+    def __setitem__(self, name, record):
+        self._book._shard(name).data[name] = record
+
+    def __delitem__(self, name):
+        del self._book._shard(name).data[name]
+
+    def __contains__(self, name):
+        return name in self._book._shard(name).data
+
+    def __iter__(self):
+        return chain.from_iterable(shard.data for shard in self._book.shards)
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self._book.shards)
+
+
+class ShardedAddressBook(AddressBook):
+    """AddressBook split by a CRC32 of the name into shard files in one directory.
+
+    Each shard is an AddressBook with its own indexes. Shard files are
+    parsed and validated in parallel worker processes on open, and save()
+    rewrites only the shards that changed, again in parallel. Lookups by
+    name go to one shard; searches, phone lookups, completion and paging
+    fan out over every shard and merge the results.
+    """
+
+    def __init__(self, directory, shards=None, unique_phones=True, record_class=Record, processes=None):
+        super().__init__(unique_phones=unique_phones, record_class=record_class)
+        self.directory = directory
+        self.processes = processes or os.cpu_count() or 1
+        found = sorted(name for name in os.listdir(directory) if SHARD_PATTERN.fullmatch(name)) \
+            if os.path.isdir(directory) else []
+        if found and shards not in (None, len(found)):
+            raise ValueError(f"{directory} holds {len(found)} shards, not {shards}")
+        count = len(found) or shards or SHARD_COUNT
+        self.shards = [AddressBook(unique_phones=False, record_class=record_class) for _ in range(count)]
+        for shard in self.shards:
+            # One counter across shards keeps insertion order comparable when merging.
+            shard._sequence = self._sequence
+        self.data = ShardedRecords(self)
+        self._dirty = set() if found else set(range(count))
+        if found:
+            self._load()
+
+    def __setitem__(self, name, record):
+        for phone in record.phone_values():
+            self._check_phone(name, phone)
+        index = shard_index(name, len(self.shards))
+        self.shards[index][name] = record
+        record._book = self
+        self._dirty.add(index)
+        self.version += 1
+
+    def __delitem__(self, name):
+        index = shard_index(name, len(self.shards))
+        del self.shards[index][name]
+        self._dirty.add(index)
+        self.version += 1
+
+    def find_by_phone(self, phone):
+        owner = self._phone_owner(phone)
+        return self.data[owner] if owner is not None else None
+
+    def duplicate_phones(self):
+        owners = defaultdict(list)
+        for shard in self.shards:
+            for phone, names in shard._phones.items():
+                owners[phone] += names
+        return {phone: [self.data[name] for name in names] for phone, names in owners.items() if len(names) > 1}
+
+    def search(self, query):
+        return list(heapq.merge(*(shard.search(query) for shard in self.shards), key=self._insertion_key))
+
+    def fuzzy_find(self, name, max_distance=None):
+        matches = chain.from_iterable(shard.fuzzy_find(name, max_distance) for shard in self.shards)
+        return sorted(matches, key=lambda record: (edit_distance(name.lower(), record.name.value.lower()),
+                                                   record.name.value.lower(), record.name.value))
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        return list(islice(heapq.merge(*(shard.complete(prefix, limit) for shard in self.shards)), limit))
+
+    def query(self, query):
+        query = Query(query) if isinstance(query, str) else query
+        return list(heapq.merge(*(shard.query(query) for shard in self.shards), key=self._insertion_key))
+
+    def explain(self, query):
+        query = Query(query) if isinstance(query, str) else query
+        return "\n".join(f"shard {index}:\n{shard.explain(query)}" for index, shard in enumerate(self.shards))
+
+    def save(self, filename=None):
+        self.snapshot_writer(filename)()
+
+    def snapshot_writer(self, filename=None):
+        directory = filename or self.directory
+        os.makedirs(directory, exist_ok=True)
+        dirty = range(len(self.shards)) if directory != self.directory else sorted(self._dirty)
+        jobs = [(self.shards[index].snapshot(), shard_path(directory, index)) for index in dirty]
+        if directory == self.directory:
+            self._dirty.clear()
+        return functools.partial(write_shards, jobs, self.processes)
+
+    def _load(self):
+        files = [shard_path(self.directory, index) for index in range(len(self.shards))]
+        processes = min(self.processes, len(files))
+        if processes > 1 and sum(map(os.path.getsize, files)) > PARALLEL_LOAD_BYTES:
+            with ProcessPoolExecutor(processes) as pool:
+                results = list(pool.map(read_contacts, files))
+        else:
+            results = list(map(read_contacts, files))
+        strays = []
+        for index, (filename, (valid, rejected)) in enumerate(zip(files, results)):
+            if rejected:
+                _, (name, _, _), reason = rejected[0]
+                raise ValueError(f"{filename}: contact {name!r}: {reason}")
+            rows = []
+            for row in valid:
+                (rows if shard_index(row[1], len(self.shards)) == index else strays).append(row[1:])
+            # Phones shared across shards on disk are accepted, as load_contacts accepts them within a file.
+            self.shards[index]._load_rows(rows)
+            for record in self.shards[index].data.values():
+                # Edits go through this book, which checks phones across shards and marks the shard dirty.
+                record._book = self
+        with self.allowing_shared_phones():
+            # Contacts written to the wrong shard file by hand go where their name hashes.
+            for name, phones, birthday, birthday_date in strays:
+                self[name] = self.record_class.from_trusted(name, phones, birthday, birthday_date)
+        self._dirty.clear()
+
+    def _shard(self, name):
+        return self.shards[shard_index(name, len(self.shards))]
+
+    def _insertion_key(self, record):
+        return self._shard(record.name.value)._order[record.name.value]
+
+    def _phone_owner(self, phone):
+        return next((owners[0] for shard in self.shards if (owners := shard._phones.get(phone))), None)
+
+    def _check_phone(self, name, phone):
+        owner = self._phone_owner(phone) if self.unique_phones else None
+        if owner is not None and owner != name:
+            raise ValueError(f"Phone number {phone} already belongs to {owner}")
+
+    def _reindex(self, record):
+        index = shard_index(record.name.value, len(self.shards))
+        self.shards[index]._reindex(record)
+        self._dirty.add(index)
+        self.version += 1
+
+    def _birthdays_between(self, low, high):
+        return list(heapq.merge(*(shard._birthdays_between(low, high) for shard in self.shards)))
+
+    def _birthday_range(self, after, before, limit):
+        return list(islice(heapq.merge(*(shard._birthday_range(after, before, limit) for shard in self.shards)),
+                           limit))
+
+    def _name_range(self, after, limit):
+        return list(islice(heapq.merge(*(shard._name_range(after, limit) for shard in self.shards)), limit))
+
+
+def migrate_json_to_shards(filename, shards=SHARD_COUNT):
+    """Split a JSON contacts file into a directory of shards at the same path.
+
+    The original file is kept next to it with a .json suffix, as with
+    migrate_json_to_sqlite.
+    """
+    json_book = load_contacts(filename)
+    os.replace(filename, filename + ".json")
+    book = ShardedAddressBook(filename, shards, unique_phones=json_book.unique_phones,
+                              record_class=json_book.record_class)
+    with book.allowing_shared_phones():
+        for record in json_book.values():
+            book.add_record(record)
+    book.save()
+    journal = Journal(filename)
+    if os.path.exists(journal.path):
+        os.remove(journal.path)
+    return book
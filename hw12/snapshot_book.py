@@ -0,0 +1,257 @@
+"""
+AddressBook opened from a memory-mapped binary snapshot.
+
+write_snapshot lays the contacts out as fixed-size entries and sorted
+sections, so a book opens without parsing and records are decoded only
+when they are read.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+import functools
+from itertools import accumulate, islice
+import mmap
+import os
+import struct
+import sys
+import weakref
+import zlib
+
+from addressbook import AddressBook, Record, pack_phone, parse_birthday, save_contacts
+
+
+SNAPSHOT_MAGIC = b"HW12SNAP"
+SNAPSHOT_VERSION = 1
+# magic, version, crc32 of everything after the header, contact count and the
+# offsets of the phone, sorted-name, entry and string sections; padded to 64 bytes.
+SNAPSHOT_HEADER = struct.Struct("<8sHIQQQQQ10x")
+# string offset, name length, birthday length, first phone slot, phone count.
+SNAPSHOT_ENTRY = struct.Struct("<QHBQH")
+
+
+def write_snapshot(rows, filename):
+    """Write (name, phones, birthday) rows as a binary snapshot.
+
+    Layout after the header: one 64-bit slot per phone, the record numbers
+    sorted by name (for bisecting), one fixed-size entry per record, then
+    the UTF-8 names and birthdays the entries point into.
+    """
+    phones, entries, strings, names = array('Q'), bytearray(), bytearray(), []
+    for name, numbers, birthday in rows:
+        name_bytes = name.encode()
+        birthday_bytes = birthday.encode() if birthday else b""
+        entries += SNAPSHOT_ENTRY.pack(len(strings), len(name_bytes), len(birthday_bytes), len(phones), len(numbers))
+        strings += name_bytes + birthday_bytes
+        phones.extend(map(pack_phone, numbers))
+        names.append(name)
+    order = array('I', sorted(range(len(names)), key=names.__getitem__))
+    if sys.byteorder == "big":
+        phones.byteswap()
+        order.byteswap()
+    sections = [phones.tobytes(), order.tobytes(), bytes(entries), bytes(strings)]
+    offsets = list(accumulate((len(section) for section in sections[:-1]), initial=SNAPSHOT_HEADER.size))
+    checksum = 0
+    for section in sections:
+        checksum = zlib.crc32(section, checksum)
+    with open(filename + '.tmp', 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, checksum, len(names), *offsets))
+        file.writelines(sections)
+    os.replace(filename + '.tmp', filename)
+
+
+class SnapshotRecords(MutableMapping):
+    """Name -> Record mapping read on demand from a memory-mapped snapshot.
+
+    Opening decodes nothing: names are found by bisecting the sorted name
+    table and records are built when they are looked up, cached only while
+    something references them. Changes stay in memory on top of the mapping
+    until the book is written out again.
+    """
+
+    def __init__(self, filename, book, verify=False):
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, checksum, self._count, phones_at, order_at, self._entries_at, self._strings_at = \
+            SNAPSHOT_HEADER.unpack_from(self._view)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{filename} is not a contacts snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        if verify and zlib.crc32(self._view[SNAPSHOT_HEADER.size:]) != checksum:
+            raise ValueError(f"{filename} is corrupted: checksum mismatch")
+        self._phones = self._view[phones_at:order_at].cast('Q')
+        self._order = self._view[order_at:self._entries_at].cast('I')
+        if sys.byteorder == "big":
+            self._phones, self._order = array('Q', self._phones), array('I', self._order)
+            self._phones.byteswap()
+            self._order.byteswap()
+        self._book = book
+        self._loaded = weakref.WeakValueDictionary()
+        self._changed = {}
+        self._added = {}
+        self._removed = set()
+
+    def __getitem__(self, name):
+        record = self._changed.get(name) or self._loaded.get(name)
+        if record is None:
+            index = self._find(name) if name not in self._removed else None
+            if index is None:
+                raise KeyError(name)
+            record = self._record(index, name)
+        return record
+
+    def __setitem__(self, name, record):
+        if name in self._removed or (name not in self._changed and self._find(name) is None):
+            self._added[name] = None
+        self._changed[name] = record
+        self._loaded[name] = record
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self._changed.pop(name, None)
+        self._loaded.pop(name, None)
+        if name in self._added:
+            del self._added[name]
+        else:
+            self._removed.add(name)
+
+    def __contains__(self, name):
+        return name in self._changed or (name not in self._removed and self._find(name) is not None)
+
+    def __iter__(self):
+        for index in range(self._count):
+            name = self._name(index)
+            if name not in self._removed:
+                yield name
+        yield from self._added
+
+    def __len__(self):
+        return self._count - len(self._removed) + len(self._added)
+
+    def records(self):
+        """Every record in insertion order, decoded one at a time."""
+        for index in range(self._count):
+            name = self._name(index)
+            if name not in self._removed:
+                yield self._changed.get(name) or self._loaded.get(name) or self._record(index, name)
+        for name in self._added:
+            yield self._changed[name]
+
+    def rows(self):
+        """(name, phones, birthday) for every contact, without building records."""
+        for index in range(self._count):
+            offset, name_length, birthday_length, first, phones = self._entry(index)
+            name = str(self._view[offset:offset + name_length], 'utf-8')
+            if name in self._removed:
+                continue
+            record = self._changed.get(name)
+            if record is not None:
+                yield name, record.phone_values(), record.birthday.value if record.birthday else None
+                continue
+            birthday = str(self._view[offset + name_length:offset + name_length + birthday_length], 'utf-8')
+            yield name, [f"{number:010d}" for number in self._phones[first:first + phones]], birthday or None
+        for name in self._added:
+            record = self._changed[name]
+            yield name, record.phone_values(), record.birthday.value if record.birthday else None
+
+    def store(self, record):
+        self[record.name.value] = record
+
+    def close(self):
+        self._phones = self._order = None
+        self._view.release()
+        self._map.close()
+
+    def _entry(self, index):
+        offset, *rest = SNAPSHOT_ENTRY.unpack_from(self._view, self._entries_at + index * SNAPSHOT_ENTRY.size)
+        return (self._strings_at + offset, *rest)
+
+    def _name(self, index):
+        offset, name_length, *_ = self._entry(index)
+        return str(self._view[offset:offset + name_length], 'utf-8')
+
+    def _find(self, name):
+        position = bisect_left(range(self._count), name, key=lambda i: self._name(self._order[i]))
+        if position < self._count and self._name(self._order[position]) == name:
+            return self._order[position]
+        return None
+
+    def _record(self, index, name):
+        offset, name_length, birthday_length, first, phones = self._entry(index)
+        birthday = str(self._view[offset + name_length:offset + name_length + birthday_length], 'utf-8')
+        record = self._book.record_class.from_trusted(
+            name, [f"{number:010d}" for number in self._phones[first:first + phones]], birthday or None)
+        record._book = self._book
+        self._loaded[name] = record
+        return record
+
+
+def indexed(method):
+    """Build the book's in-memory indexes before the first call that needs them."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self._indexes_built:
+            self._build_indexes()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SnapshotAddressBook(AddressBook):
+    """AddressBook opened from a memory-mapped binary snapshot.
+
+    Opening only maps the file; find(), `in`, len() and iterator() read
+    records straight from the mapping. The phone, search, birthday and name
+    indexes are built from the mapped data the first time a query or a
+    change needs them, and save() writes a fresh snapshot.
+    """
+
+    def __init__(self, filename, unique_phones=True, record_class=Record, verify=False):
+        super().__init__(unique_phones=unique_phones, record_class=record_class)
+        self.data = SnapshotRecords(filename, self, verify)
+        self._indexes_built = False
+
+    __setitem__ = indexed(AddressBook.__setitem__)
+    __delitem__ = indexed(AddressBook.__delitem__)
+    find_by_phone = indexed(AddressBook.find_by_phone)
+    duplicate_phones = indexed(AddressBook.duplicate_phones)
+    page = indexed(AddressBook.page)
+    upcoming_birthdays = indexed(AddressBook.upcoming_birthdays)
+    search = indexed(AddressBook.search)
+    fuzzy_find = indexed(AddressBook.fuzzy_find)
+    complete = indexed(AddressBook.complete)
+    query = indexed(AddressBook.query)
+    explain = indexed(AddressBook.explain)
+    _check_phone = indexed(AddressBook._check_phone)
+
+    def iterator(self, n):
+        records = self.data.records()
+        while True:
+            chunk = list(islice(records, n))
+            if not chunk:
+                return
+            yield chunk
+
+    def rows(self):
+        return self.data.rows()
+
+    def save(self, filename):
+        save_contacts(self, filename, binary=True)
+
+    def snapshot_writer(self, filename):
+        return functools.partial(write_snapshot, list(self.rows()), filename)
+
+    def close(self):
+        self.data.close()
+
+    @indexed
+    def _reindex(self, record):
+        self.data.store(record)
+        super()._reindex(record)
+
+    def _build_indexes(self):
+        self._indexes_built = True
+        self._index_rows((name, phones, birthday and parse_birthday(birthday))
+                         for name, phones, birthday in self.data.rows())
@@ -0,0 +1,319 @@
+"""
+AddressBook stored in SQLite, for books larger than memory.
+
+Every change is committed as it happens; lookups, prefix completion,
+birthdays and queries run as indexed SQL instead of scanning the book.
+"""
+
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+import os
+import sqlite3
+import weakref
+
+from addressbook import (COMPLETION_LIMIT, PREFIX_END, AddressBook, Journal, Query, Record,
+                         fuzzy_distance, fuzzy_grams, load_contacts, rank_fuzzy, record_from_dict)
+
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    name_lower TEXT NOT NULL,
+    birthday TEXT,
+    birthday_key INTEGER
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday_key ON contacts (birthday_key, name);
+CREATE TABLE IF NOT EXISTS phones (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id),
+    position INTEGER NOT NULL,
+    phone TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones (phone);
+CREATE INDEX IF NOT EXISTS phones_contact ON phones (contact_id, position);
+"""
+
+
+class SQLiteRecords(MutableMapping):
+    """Name -> Record mapping stored in SQLite.
+
+    Records are materialised on first access and cached only while something
+    still references them, so the whole book never has to be in memory.
+    """
+
+    def __init__(self, connection, book):
+        self.db = connection
+        self._book = book
+        self._loaded = weakref.WeakValueDictionary()
+        self.autocommit = True
+
+    def __getitem__(self, name):
+        record = self._loaded.get(name)
+        if record is None:
+            row = self.db.execute("SELECT id, birthday FROM contacts WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                raise KeyError(name)
+            phones = [phone for phone, in self.db.execute(
+                "SELECT phone FROM phones WHERE contact_id = ? ORDER BY position", (row[0],))]
+            record = record_from_dict(name, {"phones": phones, "birthday": row[1]}, self._book.record_class)
+            record._book = self._book
+            self._loaded[name] = record
+        return record
+
+    def __setitem__(self, name, record):
+        self.write(record)
+        self._loaded[name] = record
+
+    def __delitem__(self, name):
+        with self.transaction():
+            self.db.execute("DELETE FROM phones WHERE contact_id IN (SELECT id FROM contacts WHERE name = ?)", (name,))
+            deleted = self.db.execute("DELETE FROM contacts WHERE name = ?", (name,)).rowcount
+        if not deleted:
+            raise KeyError(name)
+        self._loaded.pop(name, None)
+
+    def __contains__(self, name):
+        return self.db.execute("SELECT 1 FROM contacts WHERE name = ?", (name,)).fetchone() is not None
+
+    def __iter__(self):
+        for name, in self.db.execute("SELECT name FROM contacts ORDER BY id").fetchall():
+            yield name
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def cached(self, name):
+        return self._loaded.get(name)
+
+    def write(self, record):
+        with self.transaction():
+            self.store(record)
+
+    @contextmanager
+    def transaction(self):
+        """Apply one change atomically, committing it unless commits are deferred."""
+        self.db.execute("SAVEPOINT change")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK TO change")
+            self.db.execute("RELEASE change")
+            raise
+        self.db.execute("RELEASE change")
+        if self.autocommit:
+            self.db.commit()
+
+    def defer_commits(self):
+        if self.autocommit:
+            self.autocommit = False
+            self.db.execute("BEGIN")
+
+    def commit(self):
+        self.db.commit()
+        self.autocommit = True
+
+    def store(self, record):
+        name = record.name.value
+        birthday = record.birthday.date if record.birthday else None
+        self.db.execute(
+            "INSERT INTO contacts (name, name_lower, birthday, birthday_key) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET birthday = excluded.birthday, birthday_key = excluded.birthday_key",
+            (name, name.lower(), record.birthday.value if birthday else None,
+             birthday.month * 100 + birthday.day if birthday else None))
+        contact_id = self.db.execute("SELECT id FROM contacts WHERE name = ?", (name,)).fetchone()[0]
+        self.db.execute("DELETE FROM phones WHERE contact_id = ?", (contact_id,))
+        self.db.executemany("INSERT INTO phones (contact_id, position, phone) VALUES (?, ?, ?)",
+                            [(contact_id, position, phone) for position, phone in enumerate(record.phone_values())])
+
+
+class SQLiteAddressBook(AddressBook):
+    """AddressBook stored in a SQLite database instead of memory.
+
+    Lookups go through the indexed name and phone columns, and every change
+    is committed as it happens, so there is nothing to save on exit.
+    """
+
+    writes_through = True
+
+    def __init__(self, filename, unique_phones=True, record_class=Record):
+        super().__init__(unique_phones=unique_phones, record_class=record_class)
+        connection = sqlite3.connect(filename)
+        connection.executescript(SQLITE_SCHEMA)
+        self.data = SQLiteRecords(connection, self)
+
+    def __setitem__(self, name, record):
+        for phone in record.phone_values():
+            self._check_phone(name, phone)
+        old_record = self.data.cached(name)
+        if old_record is not None and old_record is not record:
+            old_record._book = None
+        record._book = self
+        self.data[name] = record
+        self.version += 1
+
+    def __delitem__(self, name):
+        record = self.data.cached(name)
+        del self.data[name]
+        if record is not None:
+            record._book = None
+        self.version += 1
+
+    def iterator(self, n):
+        last_id = 0
+        while True:
+            rows = self.data.db.execute(
+                "SELECT id, name FROM contacts WHERE id > ? ORDER BY id LIMIT ?", (last_id, n)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [self.data[name] for _, name in rows]
+
+    def find_by_phone(self, phone):
+        owner = self._phone_owner(phone)
+        return self.data[owner] if owner is not None else None
+
+    def duplicate_phones(self):
+        rows = self.data.db.execute(
+            "SELECT phone FROM phones GROUP BY phone HAVING COUNT(DISTINCT contact_id) > 1").fetchall()
+        return {phone: [self.data[name] for name, in self.data.db.execute(
+                    "SELECT DISTINCT c.name FROM phones p JOIN contacts c ON c.id = p.contact_id "
+                    "WHERE p.phone = ? ORDER BY c.id", (phone,))]
+                for phone, in rows}
+
+    def search(self, query):
+        names = [name for name, in self.data.db.execute(
+            "SELECT name FROM contacts WHERE instr(name_lower, ?) > 0 "
+            "OR id IN (SELECT contact_id FROM phones WHERE instr(phone, ?) > 0) ORDER BY id",
+            (query.lower(), query))]
+        return [record for record in map(self.data.__getitem__, names) if record.matches(query)]
+
+    def fuzzy_find(self, name, max_distance=None):
+        if max_distance is None:
+            max_distance = fuzzy_distance(name)
+        name = name.lower()
+        grams = fuzzy_grams(name, max_distance)
+        if grams is not None:
+            grams = grams[:len(grams[0]) * max_distance + 1]
+            sql = ("SELECT name, name_lower FROM contacts WHERE "
+                   + " OR ".join(["instr(' ' || name_lower || ' ', ?) > 0"] * len(grams)))
+        else:
+            sql, grams = "SELECT name, name_lower FROM contacts WHERE abs(length(name_lower) - ?) <= ?", \
+                [len(name), max_distance]
+        return [self.data[match] for *_, match in rank_fuzzy(name, self.data.db.execute(sql, grams), max_distance)]
+
+    def query(self, query):
+        query = Query(query) if isinstance(query, str) else query
+        return [self.data[name] for name, in self.data.db.execute(*self._query_sql(query))]
+
+    def explain(self, query):
+        """SQLite's own plan for the query."""
+        query = Query(query) if isinstance(query, str) else query
+        sql, params = self._query_sql(query)
+        return "\n".join(detail for *_, detail in self.data.db.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        return [name for name, in self.data.db.execute(
+            "SELECT name FROM contacts WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+            (prefix, prefix + PREFIX_END, limit))]
+
+    def save(self, filename=None):
+        self.data.commit()
+
+    @contextmanager
+    def deferred_writes(self, filename=None):
+        """Group every change inside the block into a single transaction."""
+        self.data.defer_commits()
+        try:
+            yield self
+        finally:
+            self.data.commit()
+
+    def close(self):
+        self.data.db.close()
+
+    def _birthdays_between(self, low, high):
+        return [(key // 100, key % 100, name) for key, name in self.data.db.execute(
+            "SELECT birthday_key, name FROM contacts WHERE birthday_key >= ? AND birthday_key < ? "
+            "ORDER BY birthday_key, name", (low[0] * 100 + low[1], high[0] * 100 + high[1]))]
+
+    def _birthday_range(self, after, before, limit):
+        clauses, params = [], []
+        if after and len(after) == 2:
+            clauses.append("birthday_key >= ?")
+            params.append(after[0] * 100 + after[1])
+        elif after:
+            clauses.append("(birthday_key, name) > (?, ?)")
+            params += [after[0] * 100 + after[1], after[2]]
+        else:
+            clauses.append("birthday_key IS NOT NULL")
+        if before:
+            clauses.append("birthday_key < ?")
+            params.append(before[0] * 100 + before[1])
+        return [(key // 100, key % 100, name) for key, name in self.data.db.execute(
+            f"SELECT birthday_key, name FROM contacts WHERE {' AND '.join(clauses)} "
+            "ORDER BY birthday_key, name LIMIT ?", (*params, limit))]
+
+    def _name_range(self, after, limit):
+        if after is None:
+            rows = self.data.db.execute("SELECT name FROM contacts ORDER BY name LIMIT ?", (limit,))
+        else:
+            rows = self.data.db.execute("SELECT name FROM contacts WHERE name > ? ORDER BY name LIMIT ?",
+                                        (after, limit))
+        return [name for name, in rows]
+
+    @staticmethod
+    def _query_sql(query):
+        clauses, params = [], []
+        for field, op, value in query.terms:
+            if field == "month":
+                clauses.append("birthday_key >= ? AND birthday_key < ?")
+                params += [value * 100, value * 100 + 100]
+                continue
+            column = "name" if field == "name" else "phone"
+            if op == "=":
+                condition, values = f"{column} = ?", [value]
+            elif op == "^":
+                condition, values = f"{column} >= ? AND {column} < ?", [value, value + PREFIX_END]
+            elif field == "name":
+                condition, values = "instr(name_lower, ?) > 0", [value.lower()]
+            else:
+                condition, values = "instr(phone, ?) > 0", [value]
+            if field == "phone":
+                condition = f"id IN (SELECT contact_id FROM phones WHERE {condition})"
+            clauses.append(condition)
+            params += values
+        return f"SELECT name FROM contacts WHERE {' AND '.join(clauses)} ORDER BY id", params
+
+    def _phone_owner(self, phone):
+        row = self.data.db.execute(
+            "SELECT c.name FROM phones p JOIN contacts c ON c.id = p.contact_id WHERE p.phone = ? "
+            "ORDER BY c.id LIMIT 1", (phone,)).fetchone()
+        return row[0] if row else None
+
+    def _check_phone(self, name, phone):
+        owner = self._phone_owner(phone) if self.unique_phones else None
+        if owner is not None and owner != name:
+            raise ValueError(f"Phone number {phone} already belongs to {owner}")
+
+    def _reindex(self, record):
+        self.data.write(record)
+        self.version += 1
+
+
+def migrate_json_to_sqlite(filename):
+    """Convert a JSON contacts file into a SQLite book at the same path.
+
+    The original file is kept next to it with a .json suffix; any pending
+    journal is applied first and then removed.
+    """
+    json_book = load_contacts(filename)
+    os.replace(filename, filename + ".json")
+    book = SQLiteAddressBook(filename, unique_phones=json_book.unique_phones)
+    with book.data.db:
+        for record in json_book.values():
+            book.data.store(record)
+    journal = Journal(filename)
+    if os.path.exists(journal.path):
+        os.remove(journal.path)
+    return book
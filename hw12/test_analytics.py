@@ -0,0 +1,82 @@
+from calendar import month_name
+from collections import Counter
+from datetime import date
+import unittest
+from unittest import mock
+
+import addressbook
+import analytics
+
+
+def make_book(count=300):
+    book = addressbook.AddressBook(unique_phones=False)
+    for i in range(count):
+        birthday = None if i % 7 == 0 else f"{1940 + i % 90}-{i % 12 + 1:02d}-{i % 28 + 1:02d}"
+        if i % 50 == 1:
+            birthday = "2000-02-29"
+        record = addressbook.Record(f"Contact{i}", birthday)
+        for j in range(i % 3):
+            record.add_phone(f"0{(50, 67, 93)[(i + j) % 3]}{i:04d}{j:03d}")
+        if i % 10 == 0:
+            record.add_phone(f"050{i:07d}")
+        book.add_record(record)
+    return book
+
+
+def expected_report(book, today, bucket):
+    prefixes = Counter(prefix for record in book.values() for prefix in {phone[:3] for phone in record.phone_values()})
+    months = Counter(record.birthday.date.month for record in book.values() if record.birthday)
+    ages = Counter()
+    for record in book.values():
+        if record.birthday is None:
+            continue
+        born = record.birthday.date
+        age = today.year - born.year - (addressbook.birthday_in_year(born.month, born.day, today.year) > today)
+        if age >= 0:
+            ages[age // bucket * bucket] += 1
+    return {
+        "operator_prefixes": dict(sorted(prefixes.items())),
+        "birthdays_per_month": {month_name[month]: months[month] for month in range(1, 13)},
+        "age_distribution": {f"{age}-{age + bucket - 1}": ages[age] for age in sorted(ages)},
+    }
+
+
+class AnalyticsTests:
+    """Each report matches a per-record computation; numpy is the module the reports run with, or None."""
+
+    def setUp(self):
+        patcher = mock.patch.object(analytics, "numpy", self.numpy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.book = make_book()
+
+    def test_reports_match_a_per_record_computation(self):
+        for today in (date(2024, 2, 28), date(2024, 2, 29), date(2023, 2, 28), date(2023, 12, 31)):
+            for bucket in (1, 10):
+                self.assertEqual(analytics.report(self.book, today, bucket), expected_report(self.book, today, bucket),
+                                 (today, bucket))
+
+    def test_future_birthdays_are_left_out(self):
+        today = date(2024, 1, 1)
+        self.book.add_record(addressbook.Record("Unborn", "2030-01-01"))
+        ages = analytics.age_distribution(analytics.Columns.from_book(self.book), today, 200)
+        self.assertEqual(ages, {0: sum(1 for record in self.book.values()
+                                       if record.birthday and record.birthday.date <= today)})
+
+    def test_empty_book(self):
+        self.assertEqual(analytics.report(addressbook.AddressBook(), date(2024, 1, 1)),
+                         {"operator_prefixes": {}, "birthdays_per_month": dict.fromkeys(month_name[1:], 0),
+                          "age_distribution": {}})
+
+
+class TestWithoutNumpy(AnalyticsTests, unittest.TestCase):
+    numpy = None
+
+
+@unittest.skipIf(analytics.numpy is None, "numpy is not installed")
+class TestWithNumpy(AnalyticsTests, unittest.TestCase):
+    numpy = analytics.numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
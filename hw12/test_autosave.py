@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import addressbook
+
+
+def make_record(name, *phones):
+    record = addressbook.Record(name)
+    for phone in phones:
+        record.add_phone(phone)
+    return record
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestAutosaver(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "contacts.db")
+        self.book = addressbook.load_contacts(self.filename)
+        self.autosaver = None
+
+    def tearDown(self):
+        if self.autosaver is not None and self.book.autosaver is not None:
+            self.autosaver.close()
+        self.directory.cleanup()
+
+    def start(self, interval=60, max_changes=1000):
+        self.autosaver = addressbook.Autosaver(self.book, self.filename, interval, max_changes)
+        return self.autosaver
+
+    def saved(self):
+        with open(self.filename) as file:
+            return json.load(file)
+
+    def test_flushes_after_max_changes(self):
+        autosaver = self.start(max_changes=3)
+        self.book.add_record(make_record("Ann", "0501111111"))
+        self.book.add_record(make_record("Bob", "0502222222"))
+        time.sleep(0.1)
+        self.assertEqual(autosaver.flushes, 0)
+        self.book.add_record(make_record("Cy"))
+        self.assertTrue(wait_until(lambda: autosaver.flushes == 1))
+        self.assertEqual(list(self.saved()), ["Ann", "Bob", "Cy"])
+
+    def test_flushes_every_interval(self):
+        autosaver = self.start(interval=0.05)
+        self.book.add_record(make_record("Ann", "0501111111"))
+        self.assertTrue(wait_until(lambda: autosaver.flushes == 1))
+        self.assertEqual(self.saved(), {"Ann": {"phones": ["0501111111"], "birthday": None}})
+        time.sleep(0.2)
+        # Nothing changed since, so nothing more was written.
+        self.assertEqual(autosaver.flushes, 1)
+
+    def test_only_changed_contacts_are_encoded_again(self):
+        autosaver = self.start()
+        for i in range(10):
+            self.book.add_record(make_record(f"Contact{i}", f"050000000{i}"))
+        self.assertTrue(autosaver.flush())
+        with mock.patch.object(addressbook, "record_to_dict", wraps=addressbook.record_to_dict) as encode:
+            self.book.find("Contact3").add_phone("0631112233")
+            self.book.delete("Contact7")
+            self.assertTrue(autosaver.flush())
+        self.assertEqual(encode.call_count, 1)
+        saved = self.saved()
+        self.assertEqual(len(saved), 9)
+        self.assertEqual(saved["Contact3"]["phones"], ["0500000003", "0631112233"])
+        self.assertFalse(autosaver.flush())
+
+    def test_first_flush_removes_the_journal(self):
+        self.book.journal = addressbook.Journal(self.filename)
+        self.book.add_record(make_record("Ann", "0501111111"))
+        journal_path = self.filename + addressbook.JOURNAL_SUFFIX
+        self.assertTrue(os.path.exists(journal_path))
+
+        autosaver = self.start()
+        self.assertIsNone(self.book.journal)
+        # The journal's entries alone are reason to write the file.
+        self.assertTrue(autosaver.flush())
+        self.assertFalse(os.path.exists(journal_path))
+        self.assertEqual(list(self.saved()), ["Ann"])
+        self.book.add_record(make_record("Bob"))
+        self.assertFalse(os.path.exists(journal_path))
+
+    def test_close_writes_what_is_left(self):
+        autosaver = self.start()
+        self.book.add_record(make_record("Ann", "0501111111"))
+        self.book.add_record(make_record("Bob"))
+        autosaver.close()
+        self.assertIsNone(self.book.autosaver)
+        self.assertEqual(list(self.saved()), ["Ann", "Bob"])
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), ["Ann", "Bob"])
+
+
+if __name__ == "__main__":
+    unittest.main()
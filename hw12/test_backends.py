@@ -0,0 +1,178 @@
+from datetime import date
+import os
+import tempfile
+import unittest
+
+import addressbook
+import main
+import sharded_book
+import snapshot_book
+import sqlite_book
+
+
+CONTACTS = [
+    ("John", ["0501234567", "0509876543"], "1990-03-15"),
+    ("Jane", ["0671112233"], "1985-12-30"),
+    ("Johnny", ["0931234567"], None),
+    ("Mary", [], "2000-02-29"),
+    ("mark", ["0505550000"], "1979-03-02"),
+]
+
+
+def fill(book):
+    for name, phones, birthday in CONTACTS:
+        record = addressbook.Record(name, birthday)
+        for phone in phones:
+            record.add_phone(phone)
+        book.add_record(record)
+    return book
+
+
+def names(records):
+    return [record.name.value for record in records]
+
+
+class BackendTests:
+    """The same checks run against every backend; open_book(path) creates an empty book there."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "contacts")
+        self.book = fill(self.open_book(self.path))
+
+    def tearDown(self):
+        self.close_book()
+        self.directory.cleanup()
+
+    def close_book(self):
+        close = getattr(self.book, "close", None)
+        if close is not None:
+            close()
+
+    def reopen(self):
+        self.book.save(self.path)
+        self.close_book()
+        return main.open_book(self.path)
+
+    def test_lookups(self):
+        self.assertEqual(len(self.book), len(CONTACTS))
+        self.assertEqual(self.book.find("Jane").phone_values(), ["0671112233"])
+        self.assertIsNone(self.book.find("Nobody"))
+        self.assertEqual(self.book.find_by_phone("0509876543").name.value, "John")
+        self.assertEqual(names(self.book.search("joh")), ["John", "Johnny"])
+        self.assertEqual(names(self.book.fuzzy_find("jhon")), ["John"])
+        self.assertEqual(self.book.complete("Jo"), ["John", "Johnny"])
+
+    def test_paging(self):
+        records, cursor = self.book.page(3)
+        self.assertEqual(names(records), ["Jane", "John", "Johnny"])
+        self.assertEqual(names(self.book.page(3, cursor)[0]), ["Mary", "mark"])
+        self.assertEqual(names(self.book.page(10, order="birthday", today=date(2023, 3, 1))[0]),
+                         ["mark", "John", "Jane", "Mary"])
+
+    def test_query(self):
+        self.assertEqual(names(self.book.query("month=3")), ["John", "mark"])
+        self.assertEqual(names(self.book.query("name^J phone^050")), ["John"])
+
+    def test_changes(self):
+        self.book.find("John").edit_phone("0501234567", "0500000000")
+        self.book.delete("Jane")
+        self.assertIsNone(self.book.find_by_phone("0501234567"))
+        self.assertEqual(self.book.find_by_phone("0500000000").name.value, "John")
+        self.assertNotIn("Jane", self.book)
+
+    def test_unique_phones(self):
+        record = addressbook.Record("Copy")
+        record.add_phone("0931234567")
+        with self.assertRaises(ValueError):
+            self.book.add_record(record)
+        self.assertNotIn("Copy", self.book)
+
+    def test_saved_book_reopens(self):
+        self.book.find("mark").add_phone("0631112233")
+        self.book.delete("Johnny")
+        expected = self.book.snapshot()
+        self.book = self.reopen()
+        self.assertIsInstance(self.book, self.book_class)
+        self.assertEqual(self.book.snapshot(), expected)
+        self.assertEqual(self.book.find_by_phone("0631112233").name.value, "mark")
+
+
+class TestJSONBook(BackendTests, unittest.TestCase):
+    book_class = addressbook.AddressBook
+
+    def open_book(self, path):
+        return main.open_book(path)
+
+
+class TestSQLiteBook(BackendTests, unittest.TestCase):
+    book_class = sqlite_book.SQLiteAddressBook
+
+    def open_book(self, path):
+        return sqlite_book.SQLiteAddressBook(path)
+
+
+class TestSnapshotBook(BackendTests, unittest.TestCase):
+    book_class = snapshot_book.SnapshotAddressBook
+
+    def open_book(self, path):
+        snapshot_book.write_snapshot([], path)
+        return snapshot_book.SnapshotAddressBook(path)
+
+
+class TestShardedBook(BackendTests, unittest.TestCase):
+    book_class = sharded_book.ShardedAddressBook
+
+    def open_book(self, path):
+        return sharded_book.ShardedAddressBook(path, shards=3, processes=1)
+
+    def test_loaded_records_edit_through_the_book(self):
+        self.book = self.reopen()
+        john = self.book.find("John")
+        with self.assertRaises(ValueError):
+            john.add_phone("0671112233")
+        john.edit_phone("0509876543", "0631112233")
+        self.assertEqual(self.book.find_by_phone("0631112233").name.value, "John")
+        self.book = self.reopen()
+        self.assertEqual(self.book.find("John").phone_values(), ["0501234567", "0631112233"])
+
+    def test_contacts_in_the_wrong_shard_file_still_load(self):
+        stray = {name: {"phones": phones, "birthday": birthday} for name, phones, birthday in CONTACTS}
+        os.makedirs(self.path, exist_ok=True)
+        for index in range(3):
+            addressbook.write_contacts(stray if index == 0 else {}, sharded_book.shard_path(self.path, index))
+        self.close_book()
+        self.book = main.open_book(self.path)
+        self.assertEqual(sorted(self.book), sorted(name for name, _, _ in CONTACTS))
+        self.assertEqual(self.book.find_by_phone("0931234567").name.value, "Johnny")
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "contacts.db")
+        book = fill(addressbook.AddressBook())
+        addressbook.save_contacts(book, self.path)
+        self.expected = book.snapshot()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_json_to_sqlite(self):
+        book = sqlite_book.migrate_json_to_sqlite(self.path)
+        self.assertEqual(book.snapshot(), self.expected)
+        book.close()
+        book = main.open_book(self.path)
+        self.assertIsInstance(book, sqlite_book.SQLiteAddressBook)
+        self.assertEqual(book.snapshot(), self.expected)
+        book.close()
+
+    def test_json_to_shards(self):
+        sharded_book.migrate_json_to_shards(self.path, shards=2)
+        book = main.open_book(self.path)
+        self.assertIsInstance(book, sharded_book.ShardedAddressBook)
+        self.assertEqual(book.snapshot(), self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+from datetime import date
+import unittest
+
+import addressbook
+
+
+def make_rows(count):
+    for i in range(count):
+        birthday = date(1950 + i % 50, i % 12 + 1, i % 28 + 1) if i % 5 else None
+        yield f"Contact{i:04d}", [], birthday and birthday.isoformat(), birthday
+
+
+def brute_force(book, days, today):
+    return sorted((record.days_to_birthday(today), record.name.value) for record in book.values()
+                  if record.birthday is not None and record.days_to_birthday(today) <= days)
+
+
+def upcoming(book, days, today):
+    return sorted(((when - today).days, record.name.value) for when, record in book.upcoming_birthdays(days, today))
+
+
+class TestUpcomingBirthdays(unittest.TestCase):
+    def setUp(self):
+        self.book = addressbook.AddressBook()
+        self.book._load_rows(make_rows(1000))
+
+    def test_matches_a_full_scan(self):
+        for today in (date(2023, 1, 1), date(2023, 12, 20), date(2024, 2, 27), date(2023, 2, 28)):
+            for days in (0, 1, 7, 30, 300):
+                self.assertEqual(upcoming(self.book, days, today), brute_force(self.book, days, today),
+                                 (today, days))
+
+    def test_leap_day_birthday_in_a_common_year(self):
+        self.book.add_record(addressbook.Record("Leap", "2000-02-29"))
+        found = [(when, record.name.value) for when, record in self.book.upcoming_birthdays(1, date(2023, 2, 28))]
+        self.assertIn((date(2023, 2, 28), "Leap"), found)
+
+    def test_changes_keep_the_index_sorted(self):
+        self.book.upcoming_birthdays(7, date(2023, 6, 1))
+        changes = [lambda: self.book.add_record(addressbook.Record("Contact0001", "1990-06-03")),
+                   lambda: self.book.add_record(addressbook.Record("New", "1980-06-02")),
+                   lambda: self.book.delete("Contact0002")]
+        for change in changes:
+            change()
+            # Each change is an insert or delete in place, never a fresh sort on the next read.
+            self.assertTrue(self.book._birthdays._sorted)
+        today = date(2023, 6, 1)
+        self.assertEqual(upcoming(self.book, 7, today), brute_force(self.book, 7, today))
+        self.assertEqual(self.book._birthdays.items, sorted(self.book._birthdays.items))
+
+
+if __name__ == "__main__":
+    unittest.main()
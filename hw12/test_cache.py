@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import addressbook
+
+
+def make_book(*names):
+    book = addressbook.AddressBook()
+    for i, name in enumerate(names):
+        record = addressbook.Record(name, "1990-03-01" if i % 2 else None)
+        record.add_phone(f"050000000{i}")
+        book.add_record(record)
+    return book
+
+
+class TestLoadCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "contacts.db")
+        self.book = make_book("Ann", "Bob", "Cy")
+        addressbook.save_contacts(self.book, self.filename)
+        addressbook.write_cache(addressbook.load_contacts(self.filename), self.filename)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, **kwargs):
+        """Load with the cache, returning the book and whether the file was parsed."""
+        with mock.patch.object(addressbook, "contact_batches", wraps=addressbook.contact_batches) as read:
+            book = addressbook.load_contacts(self.filename, cache=True, **kwargs)
+        return book, read.called
+
+    def test_hit(self):
+        book, parsed = self.load()
+        self.assertFalse(parsed)
+        self.assertTrue(book.cached)
+        self.assertEqual(book.snapshot(), self.book.snapshot())
+        self.assertEqual(book.find_by_phone("0500000001").name.value, "Bob")
+        self.assertEqual([record.name.value for record in book.search("cy")], ["Cy"])
+
+    def test_journal_replays_over_a_hit(self):
+        book = addressbook.load_contacts(self.filename)
+        book.journal = addressbook.Journal(self.filename)
+        book.delete("Bob")
+        book.journal.close()
+        book, parsed = self.load()
+        self.assertFalse(parsed)
+        self.assertEqual(list(book), ["Ann", "Cy"])
+
+    def test_miss_after_the_file_changes(self):
+        addressbook.save_contacts(make_book("Ann", "Dan"), self.filename)
+        book, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual(list(book), ["Ann", "Dan"])
+
+    def test_miss_on_another_cache_version(self):
+        with mock.patch.object(addressbook, "CACHE_VERSION", addressbook.CACHE_VERSION + 1):
+            book, parsed = self.load()
+        self.assertTrue(parsed)
+        self.assertEqual(book.snapshot(), self.book.snapshot())
+
+    def test_miss_on_another_record_class(self):
+        book, parsed = self.load(record_class=addressbook.CompactRecord)
+        self.assertTrue(parsed)
+        self.assertIsInstance(book.find("Ann"), addressbook.CompactRecord)
+
+    def test_write_skips_an_unchanged_file(self):
+        book, _ = self.load()
+        with mock.patch.object(addressbook.pickle, "dump") as dump:
+            addressbook.write_cache(book, self.filename)
+        dump.assert_not_called()
+
+        addressbook.save_contacts(make_book("Ann", "Dan"), self.filename)
+        book, _ = self.load()
+        addressbook.write_cache(book, self.filename)
+        self.assertEqual(addressbook.stored_cache_key(self.filename), addressbook.cache_key(self.filename))
+        book, parsed = self.load()
+        self.assertFalse(parsed)
+        self.assertEqual(list(book), ["Ann", "Dan"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import addressbook
+
+
+def make_book(count=500):
+    book = addressbook.AddressBook()
+    book._load_rows((f"{prefix}{i:03d}", [], None, None) for i in range(count) for prefix in ("ann", "bob"))
+    return book
+
+
+class TestCompletion(unittest.TestCase):
+    def setUp(self):
+        self.book = make_book()
+
+    def test_prefixes(self):
+        self.assertEqual(self.book.complete("ann00"), [f"ann00{i}" for i in range(10)])
+        self.assertEqual(self.book.complete("bob", 3), ["bob000", "bob001", "bob002"])
+        self.assertEqual(len(self.book.complete("")), addressbook.COMPLETION_LIMIT)
+        self.assertEqual(self.book.complete("carl"), [])
+
+    def test_changes_keep_the_name_index_sorted(self):
+        self.book.complete("a")
+        changes = [lambda: self.book.add_record(addressbook.Record("annie")),
+                   lambda: self.book.add_record(addressbook.Record("Aaron")),
+                   lambda: self.book.delete("ann001"),
+                   lambda: self.book.delete("bob499")]
+        for change in changes:
+            change()
+            # A single change is an insert or delete in place, never a fresh sort on the next read.
+            self.assertTrue(self.book._names._sorted)
+        self.assertEqual(self.book.complete("ann", 3), ["ann000", "ann002", "ann003"])
+        self.assertEqual(self.book.complete("anni"), ["annie"])
+        self.assertEqual(self.book.complete("A"), ["Aaron"])
+        self.assertEqual(self.book._names.items, sorted(self.book))
+
+    def test_page_after_changes(self):
+        records, cursor = self.book.page(2)
+        self.book.add_record(addressbook.Record("aaa"))
+        self.book.delete("ann002")
+        self.assertTrue(self.book._names._sorted)
+        records, _ = self.book.page(2, cursor)
+        self.assertEqual([record.name.value for record in records], ["ann003", "ann004"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+import unittest
+
+import addressbook
+
+
+def run_with_timeout(target, timeout=5):
+    """Run target on a daemon thread; return its exception, or fail if it is still running."""
+    errors = []
+
+    def wrapper():
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=wrapper, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise AssertionError("deadlocked")
+    return errors[0] if errors else None
+
+
+def wait_for_writer(lock):
+    deadline = time.monotonic() + 5
+    while not lock._waiting_writers and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def make_book(count=50):
+    book = addressbook.ConcurrentAddressBook()
+    for i in range(count):
+        record = addressbook.Record(f"Contact{i:03d}", f"1990-{i % 12 + 1:02d}-01")
+        record.add_phone(f"050{i:07d}")
+        book.add_record(record)
+    return book
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def test_nested_read_does_not_wait_for_queued_writer(self):
+        lock = addressbook.ReadWriteLock()
+        outer_held = threading.Event()
+
+        def reader():
+            with lock.reading():
+                outer_held.set()
+                wait_for_writer(lock)
+                with lock.reading():
+                    pass
+
+        def write():
+            outer_held.wait(5)
+            with lock.writing():
+                pass
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        self.assertIsNone(run_with_timeout(reader))
+        writer.join(5)
+        self.assertFalse(writer.is_alive())
+
+
+class TestConcurrentAddressBook(unittest.TestCase):
+    def test_query_and_duplicates_while_writer_waits(self):
+        book = make_book()
+        outer_held = threading.Event()
+
+        def queries():
+            with book._lock.reading():
+                outer_held.set()
+                wait_for_writer(book._lock)
+                self.assertEqual(len(book.query("name^Contact00")), 10)
+                self.assertIn("index", book.explain("month=3"))
+                self.assertEqual(book.find_duplicates(), [])
+
+        def add():
+            outer_held.wait(5)
+            book.add_record(addressbook.Record("Late"))
+
+        writer = threading.Thread(target=add, daemon=True)
+        writer.start()
+        self.assertIsNone(run_with_timeout(queries))
+        writer.join(5)
+        self.assertIn("Late", book)
+
+    def test_get_during_deletes(self):
+        book = make_book(1)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        stop = threading.Event()
+
+        def churn():
+            while not stop.is_set():
+                book.delete("Contact000")
+                book.add_record(addressbook.Record("Contact000"))
+
+        churner = threading.Thread(target=churn, daemon=True)
+        churner.start()
+        try:
+            for _ in range(20000):
+                book.get("Contact000")
+        finally:
+            stop.set()
+            churner.join(5)
+            sys.setswitchinterval(interval)
+
+
+if __name__ == "__main__":
+    unittest.main()
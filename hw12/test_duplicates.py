@@ -0,0 +1,63 @@
+import unittest
+
+import addressbook
+
+
+def make_book(*contacts):
+    book = addressbook.AddressBook(unique_phones=False)
+    for name, phones, birthday in contacts:
+        record = addressbook.Record(name, birthday)
+        for phone in phones:
+            record.add_phone(phone)
+        book.add_record(record)
+    return book
+
+
+def names(groups):
+    return [[record.name.value for record in group] for group in groups]
+
+
+class TestFindDuplicates(unittest.TestCase):
+    def test_same_name_tokens_group(self):
+        book = make_book(("John Smith", [], None), ("Ann", [], None), ("smith JOHN", [], None),
+                         ("John  Smith!", [], None), ("John Smithson", [], None))
+        self.assertEqual(names(book.find_duplicates()), [["John Smith", "smith JOHN", "John  Smith!"]])
+
+    def test_shared_phones_chain(self):
+        book = make_book(("Ann", ["0501111111"], None), ("Bob", ["0502222222"], None),
+                         ("Annie", ["0501111111", "0503333333"], None), ("Cy", ["0504444444"], None),
+                         ("A. K.", ["0503333333"], None), ("bob", [], None))
+        self.assertEqual(names(book.find_duplicates()), [["Ann", "Annie", "A. K."], ["Bob", "bob"]])
+
+    def test_no_duplicates(self):
+        book = make_book(("Ann", ["0501111111"], None), ("Bob", ["0502222222"], None))
+        self.assertEqual(book.find_duplicates(), [])
+
+
+class TestMergeDuplicates(unittest.TestCase):
+    def test_phones_are_united_into_the_first_record(self):
+        book = make_book(("Ann", ["0501111111"], None), ("Bob", [], None),
+                         ("Annie", ["0502222222", "0501111111"], "1990-03-01"),
+                         ("ANN", ["0503333333"], None))
+        report = book.merge_duplicates()
+        self.assertEqual(report.merged, [("Ann", ["Annie", "ANN"])])
+        self.assertEqual(report.birthday_conflicts, [])
+        self.assertEqual(list(book), ["Ann", "Bob"])
+        ann = book.find("Ann")
+        self.assertEqual(ann.phone_values(), ["0501111111", "0502222222", "0503333333"])
+        self.assertEqual(ann.birthday.value, "1990-03-01")
+        self.assertEqual(book.find_by_phone("0502222222").name.value, "Ann")
+        self.assertEqual(book.find_duplicates(), [])
+
+    def test_birthday_conflicts_are_reported(self):
+        book = make_book(("Ann", ["0501111111"], None), ("Annie", ["0501111111"], "1990-03-01"),
+                         ("ann", [], "1991-04-02"), ("ANN", [], "1990-03-01"))
+        report = book.merge_duplicates()
+        self.assertEqual(report.birthday_conflicts, [("Ann", "1990-03-01", ["1991-04-02"])])
+        self.assertEqual(book.find("Ann").birthday.value, "1990-03-01")
+        self.assertIn("Ann: kept birthday 1990-03-01, dropped 1991-04-02", str(report))
+        self.assertTrue(str(report).startswith("Merged 3 duplicate contacts into 1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+from unittest import mock
+import unittest
+
+import addressbook
+
+
+FIRST_NAMES = ["olga", "john", "anna", "ivan", "maria", "petro", "oksana", "jo", "al"]
+
+
+def make_book(count=3000):
+    book = addressbook.AddressBook()
+    book._load_rows((f"{FIRST_NAMES[i % len(FIRST_NAMES)]}{i}", [f"050{i:07d}"], None, None) for i in range(count))
+    for name in FIRST_NAMES:
+        book.add_record(addressbook.Record(name.capitalize()))
+    return book
+
+
+def brute_force(book, name, max_distance=None):
+    if max_distance is None:
+        max_distance = addressbook.fuzzy_distance(name)
+    pairs = ((candidate, candidate.lower()) for candidate in book)
+    return [match for *_, match in addressbook.rank_fuzzy(name.lower(), pairs, max_distance)]
+
+
+class TestFuzzyFind(unittest.TestCase):
+    QUERIES = ["Jonh", "olga12", "x", "j", "aan", "oksnaa17", "petro4O", "mraia", "ivna2999"]
+
+    def setUp(self):
+        self.book = make_book()
+
+    def fuzzy(self, name, max_distance=None):
+        return [record.name.value for record in self.book.fuzzy_find(name, max_distance)]
+
+    def test_matches_a_full_scan(self):
+        for name in self.QUERIES:
+            self.assertEqual(self.fuzzy(name), brute_force(self.book, name), name)
+        for name, max_distance in (("jo", 3), ("o", 2), ("olga1", 0)):
+            self.assertEqual(self.fuzzy(name, max_distance), brute_force(self.book, name, max_distance), name)
+
+    def test_changes_reach_the_short_index(self):
+        self.fuzzy("jonh")
+        self.book.add_record(addressbook.Record("Jhon"))
+        self.book.delete("John")
+        self.book.delete("jo7")
+        for name in self.QUERIES:
+            self.assertEqual(self.fuzzy(name), brute_force(self.book, name), name)
+
+    def test_short_queries_do_not_scan_the_book(self):
+        seen = []
+        rank_fuzzy = addressbook.rank_fuzzy
+
+        def counting(name, candidates, max_distance):
+            candidates = list(candidates)
+            seen.append(len(candidates))
+            return rank_fuzzy(name, candidates, max_distance)
+
+        with mock.patch.object(addressbook, "rank_fuzzy", counting):
+            for name in ("jonh", "olga12", "x"):
+                self.fuzzy(name)
+        self.assertTrue(all(size < len(self.book) // 4 for size in seen), seen)
+
+
+if __name__ == "__main__":
+    unittest.main()
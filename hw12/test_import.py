@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+import addressbook
+
+
+ROWS = [
+    ("Ann", ["0501111111"], "1990-03-01"),
+    ("", ["0502222222"], None),
+    ("Bob", ["12345"], None),
+    ("Cy", [], "1990-02-30"),
+    ("Dan", ["0503333333", "0504444444"], None),
+    ("Ann", ["0505555555"], None),
+    ("Eve", ["0503333333"], None),
+    ("Fay", [], None),
+]
+
+
+def rejected_reasons(report):
+    return [(number, reason) for number, _, reason in report.rejected]
+
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, filename, text):
+        path = os.path.join(self.directory.name, filename)
+        with open(path, 'w', newline='') as file:
+            file.write(text)
+        return path
+
+    def test_report_lists_rejected_rows(self):
+        book = addressbook.AddressBook()
+        book.add_record(addressbook.Record("Fay"))
+        report = book.bulk_import(ROWS)
+        self.assertEqual(report.imported, 2)
+        self.assertEqual(rejected_reasons(report), [
+            (2, "Missing name"),
+            (3, "Invalid phone number '12345'"),
+            (4, "Invalid birthday '1990-02-30'"),
+            (6, "Contact already exists"),
+            (7, "Phone number 0503333333 already belongs to Dan"),
+            (8, "Contact already exists"),
+        ])
+        self.assertEqual(report.rejected[2][1], ("Cy", [], "1990-02-30"))
+        self.assertEqual(list(book), ["Fay", "Ann", "Dan"])
+        self.assertEqual(book.find("Ann").phone_values(), ["0501111111"])
+        self.assertEqual(str(report).splitlines()[:2], ["Imported 2 contacts, rejected 6", "row 2: Missing name"])
+
+    def test_several_batches_give_the_same_result(self):
+        expected = addressbook.AddressBook()
+        expected_report = expected.bulk_import(ROWS)
+        for processes in (1, 2):
+            book = addressbook.AddressBook()
+            report = book.bulk_import(ROWS, batch_size=3, processes=processes)
+            self.assertEqual(report.imported, expected_report.imported, processes)
+            self.assertEqual(report.rejected, expected_report.rejected, processes)
+            self.assertEqual(book.snapshot(), expected.snapshot(), processes)
+
+    def test_csv(self):
+        path = self.write("contacts.csv", "name,phones,birthday\n"
+                                          "Ann,0501111111; 0502222222,1990-03-01\n"
+                                          " Bob ,,\n"
+                                          "Cy,0503333333,\n")
+        self.assertEqual(list(addressbook.read_csv(path)), [
+            ("Ann", ["0501111111", "0502222222"], "1990-03-01"),
+            ("Bob", [], None),
+            ("Cy", ["0503333333"], None),
+        ])
+        path = self.write("phone.csv", "name,phone\nAnn,0501111111\n")
+        self.assertEqual(list(addressbook.read_csv(path)), [("Ann", ["0501111111"], None)])
+
+    def test_vcard_with_folded_lines(self):
+        path = self.write("contacts.vcf", "BEGIN:VCARD\r\n"
+                                          "VERSION:3.0\r\n"
+                                          "FN:Ann Maria\r\n"
+                                          "  Smith\r\n"
+                                          "TEL;TYPE=CELL:(050) 111-11\r\n"
+                                          "\t.11\r\n"
+                                          "item1.TEL:050 222 2222\r\n"
+                                          "BDAY:19900301\r\n"
+                                          "END:VCARD\r\n"
+                                          "BEGIN:VCARD\r\n"
+                                          "FN:Bob\r\n"
+                                          "END:VCARD\r\n")
+        rows = list(addressbook.read_vcard(path))
+        self.assertEqual(rows, [("Ann Maria Smith", ["0501111111", "0502222222"], "1990-03-01"), ("Bob", [], None)])
+        book = addressbook.AddressBook()
+        self.assertEqual(book.bulk_import(rows).imported, 2)
+        self.assertEqual(book.find("Ann Maria Smith").birthday.value, "1990-03-01")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import unittest
+
+import addressbook
+
+
+def make_record(name, *phones, birthday=None):
+    record = addressbook.Record(name, birthday)
+    for phone in phones:
+        record.add_phone(phone)
+    return record
+
+
+def contents(book):
+    return {name: addressbook.record_to_dict(record) for name, record in book.items()}
+
+
+class TestJournalReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "contacts.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_book(self):
+        book = addressbook.load_contacts(self.filename)
+        book.journal = addressbook.Journal(self.filename)
+        return book
+
+    def test_replay_restores_unsaved_changes(self):
+        book = self.open_book()
+        book.add_record(make_record("Ann", "0501111111", birthday="1990-03-01"))
+        book.add_record(make_record("Bob", "0502222222"))
+        book.find("Ann").edit_phone("0501111111", "0503333333")
+        book.delete("Bob")
+        expected = contents(book)
+        book.journal.close()
+
+        self.assertFalse(os.path.exists(self.filename))
+        replayed = addressbook.load_contacts(self.filename)
+        self.assertEqual(contents(replayed), expected)
+        self.assertEqual(replayed.find_by_phone("0503333333").name.value, "Ann")
+        self.assertIsNone(replayed.find_by_phone("0502222222"))
+
+    def test_replay_goes_over_the_saved_file(self):
+        book = self.open_book()
+        book.add_record(make_record("Ann", "0501111111"))
+        book.journal.compact(book)
+        book.add_record(make_record("Bob", "0502222222"))
+        book.journal.close()
+
+        with open(self.filename) as file:
+            self.assertEqual(list(json.load(file)), ["Ann"])
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), ["Ann", "Bob"])
+
+    def test_torn_tail_is_ignored(self):
+        book = self.open_book()
+        book.add_record(make_record("Ann", "0501111111"))
+        book.journal.close()
+        with open(self.filename + addressbook.JOURNAL_SUFFIX, 'a') as file:
+            file.write('["put", "Bob", {"pho')
+
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), ["Ann"])
+
+    def test_appends_after_a_torn_tail_survive(self):
+        book = self.open_book()
+        book.add_record(make_record("Ann", "0501111111"))
+        book.journal.close()
+        with open(self.filename + addressbook.JOURNAL_SUFFIX, 'a') as file:
+            file.write('["put", "Bob", {"pho')
+
+        book = self.open_book()
+        book.add_record(make_record("Cy", "0503333333"))
+        book.add_record(make_record("Dan", "0504444444"))
+        book.journal.close()
+
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), ["Ann", "Cy", "Dan"])
+
+    def test_unterminated_last_line_counts_as_torn(self):
+        book = self.open_book()
+        book.add_record(make_record("Ann", "0501111111"))
+        book.journal.close()
+        with open(self.filename + addressbook.JOURNAL_SUFFIX, 'a') as file:
+            file.write(json.dumps(["delete", "Ann"]))
+
+        book = self.open_book()
+        self.assertEqual(list(book), ["Ann"])
+        book.add_record(make_record("Bob", "0502222222"))
+        book.journal.close()
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), ["Ann", "Bob"])
+
+    def test_replay_accepts_shared_phones(self):
+        with open(self.filename + addressbook.JOURNAL_SUFFIX, 'w') as file:
+            for name in ("Ann", "Bob"):
+                file.write(json.dumps(["put", name, {"phones": ["0501111111"], "birthday": None}]) + "\n")
+
+        book = addressbook.load_contacts(self.filename)
+        self.assertEqual([record.name.value for record in book.duplicate_phones()["0501111111"]], ["Ann", "Bob"])
+        with self.assertRaises(ValueError):
+            book.add_record(make_record("Cy", "0501111111"))
+
+    def test_compact_folds_the_journal_into_the_file(self):
+        book = self.open_book()
+        book.journal.threshold = 3
+        for i in range(4):
+            book.add_record(make_record(f"Contact{i}", f"050000000{i}"))
+
+        self.assertEqual(book.journal.entries, 1)
+        with open(self.filename) as file:
+            self.assertEqual(list(json.load(file)), ["Contact0", "Contact1", "Contact2"])
+        book.journal.close()
+        self.assertEqual(list(addressbook.load_contacts(self.filename)), [f"Contact{i}" for i in range(4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+from itertools import islice
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import addressbook
+
+
+CONTACTS = {f"Contact{i}": {"phones": [f"050000000{i}"], "birthday": "1990-03-01" if i % 2 else None}
+            for i in range(7)}
+
+
+class TestLoadContacts(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "contacts.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, contacts):
+        with open(self.filename, 'w') as file:
+            json.dump(contacts, file)
+
+    def test_batches_are_numbered_across_the_file(self):
+        self.write(CONTACTS)
+        batches = list(addressbook.contact_batches(self.filename, batch_size=3))
+        self.assertEqual([len(valid) for valid, _ in batches], [3, 3, 1])
+        self.assertEqual([row[0] for valid, _ in batches for row in valid], list(range(1, 8)))
+        self.assertEqual(addressbook.read_contacts(self.filename), ([row for valid, _ in batches for row in valid], []))
+
+    def test_load_goes_batch_by_batch(self):
+        self.write(CONTACTS)
+        book = addressbook.AddressBook()
+        with mock.patch.object(addressbook, "validate_rows", wraps=addressbook.validate_rows) as validate:
+            rows = addressbook.load_rows(self.filename, batch_size=2)
+            self.assertEqual(next(rows)[0], "Contact0")
+            self.assertEqual(validate.call_count, 1)
+            book._load_rows(rows)
+        self.assertEqual([len(call.args[0]) for call in validate.call_args_list], [2, 2, 2, 1])
+        self.assertEqual(list(book), list(CONTACTS)[1:])
+
+    def test_invalid_contact_in_a_later_batch_raises(self):
+        contacts = dict(CONTACTS, Bad={"phones": ["123"], "birthday": None})
+        self.write(contacts)
+        rows = addressbook.load_rows(self.filename, batch_size=2)
+        self.assertEqual(len(list(islice(rows, 6))), 6)
+        with self.assertRaises(ValueError) as raised:
+            list(rows)
+        self.assertIn("contact 'Bad': Invalid phone number '123'", str(raised.exception))
+
+    def test_load_contacts(self):
+        self.write(CONTACTS)
+        book = addressbook.load_contacts(self.filename)
+        self.assertEqual(book.snapshot(), CONTACTS)
+        self.assertEqual(book.find_by_phone("0500000006").name.value, "Contact6")
+        self.write(dict(CONTACTS, Bad={"phones": [], "birthday": "1990-02-30"}))
+        with self.assertRaises(ValueError):
+            addressbook.load_contacts(self.filename)
+
+    def test_missing_file_loads_empty(self):
+        self.assertEqual(list(addressbook.contact_batches(self.filename)), [])
+        self.assertEqual(len(addressbook.load_contacts(self.filename)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import addressbook
+import main
+
+
+@main.input_error
+def broken(address_book):
+    return address_book.missing_method()
+
+
+class TestCommandMetrics(unittest.TestCase):
+    def setUp(self):
+        self.enabled = main.METRICS.enabled
+        main.METRICS.enabled = True
+        main.METRICS.reset()
+        main.RESULTS.clear()
+        self.book = addressbook.AddressBook()
+
+    def tearDown(self):
+        main.METRICS.enabled = self.enabled
+        main.METRICS.reset()
+        main.RESULTS.clear()
+
+    def stats(self, handler):
+        return main.METRICS.to_dict()[handler]
+
+    def test_handled_errors_are_counted_by_type(self):
+        self.assertEqual(main.add_contact(self.book, "Ann", "0501111111"), "Contact Ann added")
+        self.assertEqual(main.add_contact(self.book, "Ann", "0502222222"), "Contact already exists")
+        self.assertEqual(main.show_phone(self.book, "Bob"), "There is no such contact")
+        self.assertEqual(main.show_phone(self.book, ""), "Enter user name")
+        self.assertEqual(self.stats("add_contact")["calls"], 2)
+        self.assertEqual(self.stats("add_contact")["errors"], {"ValueError": 1})
+        self.assertEqual(self.stats("show_phone")["errors"], {"KeyError": 1, "IndexError": 1})
+
+    def test_uncaught_errors_are_counted_before_they_propagate(self):
+        with self.assertRaises(AttributeError):
+            broken(self.book)
+        stats = self.stats("broken")
+        self.assertEqual((stats["calls"], stats["errors"]), (1, {"AttributeError": 1}))
+        self.assertIn('addressbook_command_errors_total{handler="broken",error="AttributeError"} 1',
+                      main.METRICS.to_prometheus())
+
+    def test_nothing_is_recorded_while_disabled(self):
+        main.METRICS.enabled = False
+        main.add_contact(self.book, "Ann", "0501111111")
+        self.assertEqual(main.METRICS.to_dict(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from datetime import date
+import unittest
+
+import addressbook
+
+
+def make_book(names, birthdays=None):
+    book = addressbook.AddressBook()
+    for name in names:
+        book.add_record(addressbook.Record(name, (birthdays or {}).get(name)))
+    return book
+
+
+def all_pages(book, size, **kwargs):
+    pages, cursor = [], None
+    while True:
+        records, cursor = book.page(size, cursor, **kwargs)
+        pages.append([record.name.value for record in records])
+        if cursor is None:
+            return pages
+
+
+class TestNamePaging(unittest.TestCase):
+    def test_pages_cover_the_book_in_name_order(self):
+        names = [f"Contact{i:02d}" for i in range(25)][::-1]
+        pages = all_pages(make_book(names), 10)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), sorted(names))
+
+    def test_exact_multiple_ends_without_an_empty_page(self):
+        pages = all_pages(make_book(["Ann", "Bob", "Cy", "Dan"]), 2)
+        self.assertEqual(pages, [["Ann", "Bob"], ["Cy", "Dan"]])
+
+    def test_empty_book(self):
+        self.assertEqual(addressbook.AddressBook().page(10), ([], None))
+
+    def test_cursor_survives_changes_before_it(self):
+        book = make_book(["Ann", "Bob", "Cy", "Dan", "Eve"])
+        records, cursor = book.page(2)
+        self.assertEqual([record.name.value for record in records], ["Ann", "Bob"])
+        book.delete("Ann")
+        book.add_record(addressbook.Record("Abe"))
+        book.delete("Cy")
+        records, cursor = book.page(2, cursor)
+        self.assertEqual([record.name.value for record in records], ["Dan", "Eve"])
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        book = make_book(["Ann"])
+        for cursor in ("not a cursor", addressbook.encode_cursor([]), addressbook.encode_cursor(["size", 1])):
+            with self.assertRaises(ValueError):
+                book.page(1, cursor)
+
+
+class TestBirthdayPaging(unittest.TestCase):
+    def test_pages_start_today_and_wrap_past_year_end(self):
+        birthdays = {"Ann": "1990-01-05", "Bob": "1985-06-01", "Cy": "2000-12-31",
+                     "Dan": "1970-06-01", "Eve": "1995-03-10"}
+        book = make_book(["Nobody", *birthdays], birthdays)
+        pages = all_pages(book, 2, order="birthday", today=date(2024, 6, 1))
+        self.assertEqual(pages, [["Bob", "Dan"], ["Cy", "Ann"], ["Eve"]])
+
+    def test_cursor_keeps_its_anchor(self):
+        birthdays = {"Ann": "1990-01-05", "Bob": "1985-06-01", "Cy": "2000-12-31"}
+        book = make_book(birthdays, birthdays)
+        _, cursor = book.page(1, order="birthday", today=date(2024, 6, 1))
+        records, _ = book.page(5, cursor, today=date(2024, 1, 1))
+        self.assertEqual([record.name.value for record in records], ["Cy", "Ann"])
+
+
+if __name__ == "__main__":
+    unittest.main()
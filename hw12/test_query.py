@@ -0,0 +1,58 @@
+import unittest
+
+import addressbook
+
+
+def make_book(count=200):
+    book = addressbook.AddressBook()
+    for i in range(count):
+        record = addressbook.Record(f"{'Ann' if i % 50 == 0 else 'Contact'}{i:03d}",
+                                    f"1990-{i % 12 + 1:02d}-{i % 28 + 1:02d}" if i % 3 else None)
+        record.add_phone(f"05{i % 4}{i:07d}")
+        book.add_record(record)
+    return book
+
+
+def plan_steps(book, text):
+    return [(action, term) for action, term, _, _ in book._plan(addressbook.Query(text))]
+
+
+class TestQueryPlanner(unittest.TestCase):
+    def setUp(self):
+        self.book = make_book()
+
+    def test_results_match_a_full_scan(self):
+        for text in ("name^Ann", "name=Contact007", "phone=0530000003", "phone^051", "month=3",
+                     "month=march name~ct01", "name^Contact phone~99 month=5", "name~ANN", "name~q"):
+            query = addressbook.Query(text)
+            expected = [record for record in self.book.values() if query.matches(record)]
+            self.assertEqual(self.book.query(text), expected, text)
+
+    def test_most_selective_index_goes_first(self):
+        self.assertEqual(plan_steps(self.book, "month=3 name=Contact007"),
+                         [("index", ("name", "=", "Contact007")), ("filter", ("month", "=", 3))])
+
+    def test_close_estimates_are_intersected(self):
+        self.assertEqual(plan_steps(self.book, "name^Ann month=3"),
+                         [("index", ("name", "^", "Ann")), ("intersect", ("month", "=", 3))])
+
+    def test_inexact_index_keeps_its_filter(self):
+        self.assertEqual(plan_steps(self.book, "name~ann"),
+                         [("index", ("name", "~", "ann")), ("filter", ("name", "~", "ann"))])
+
+    def test_terms_without_an_index_scan(self):
+        self.assertEqual(plan_steps(self.book, "phone^05 name~a"),
+                         [("scan", None), ("filter", ("phone", "^", "05")), ("filter", ("name", "~", "a"))])
+
+    def test_explain_shows_the_plan(self):
+        self.assertEqual(self.book.explain("name=Contact007 month=8"),
+                         "1. index name=Contact007 (~1)\n2. filter month=8")
+
+    def test_invalid_queries(self):
+        for text in ("", "age=3", "month=13", "month^3", "name"):
+            with self.assertRaises(ValueError, msg=text):
+                addressbook.Query(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
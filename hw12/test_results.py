@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+
+import addressbook
+import main
+import sharded_book
+import snapshot_book
+import sqlite_book
+
+
+class CachedRepliesTests:
+    """Cached replies of every backend follow its changes; open_book(path) creates an empty book there."""
+
+    def setUp(self):
+        main.RESULTS.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.book = self.open_book(os.path.join(self.directory.name, "contacts"))
+        main.add_contact(self.book, "John", "0501234567")
+        main.add_contact(self.book, "Jane", "0671112233")
+
+    def tearDown(self):
+        close = getattr(self.book, "close", None)
+        if close is not None:
+            close()
+        if self.book.journal is not None:
+            self.book.journal.close()
+        self.directory.cleanup()
+        main.RESULTS.clear()
+
+    def test_repeated_queries_hit(self):
+        first = main.search_contact(self.book, "jo")
+        self.assertEqual(main.search_contact(self.book, "JO"), first)
+        self.assertEqual(main.show_phone(self.book, "Jane"), "0671112233")
+        self.assertEqual(main.show_phone(self.book, "Jane"), "0671112233")
+        self.assertEqual((main.RESULTS.hits, main.RESULTS.misses), (2, 2))
+
+    def test_add_invalidates(self):
+        self.assertEqual(main.search_contact(self.book, "jo").count("\n"), 0)
+        main.add_contact(self.book, "Johnny", "0931234567")
+        self.assertIn("Johnny", main.search_contact(self.book, "jo"))
+        self.assertEqual(main.RESULTS.hits, 0)
+
+    def test_delete_invalidates(self):
+        self.assertIn("Jane", main.search_contact(self.book, "ja"))
+        self.book.delete("Jane")
+        self.assertEqual(main.search_contact(self.book, "ja"), "No matching contacts found")
+        self.assertEqual(main.show_phone(self.book, "Jane"), "There is no such contact")
+
+    def test_phone_edits_invalidate(self):
+        self.assertEqual(main.show_phone(self.book, "John"), "0501234567")
+        self.assertIn("John", main.search_contact(self.book, "0501"))
+        self.book.find("John").edit_phone("0501234567", "0631112233")
+        self.assertEqual(main.show_phone(self.book, "John"), "0631112233")
+        self.assertEqual(main.search_contact(self.book, "0501"), "No matching contacts found")
+        main.change_contact(self.book, "John", "0509999999")
+        self.assertEqual(main.show_phone(self.book, "John"), "0509999999")
+        self.assertEqual(main.RESULTS.hits, 0)
+
+
+class TestJSONBook(CachedRepliesTests, unittest.TestCase):
+    def open_book(self, path):
+        return main.open_book(path)
+
+
+class TestSQLiteBook(CachedRepliesTests, unittest.TestCase):
+    def open_book(self, path):
+        return sqlite_book.SQLiteAddressBook(path)
+
+
+class TestSnapshotBook(CachedRepliesTests, unittest.TestCase):
+    def open_book(self, path):
+        snapshot_book.write_snapshot([], path)
+        return snapshot_book.SnapshotAddressBook(path)
+
+
+class TestShardedBook(CachedRepliesTests, unittest.TestCase):
+    def open_book(self, path):
+        return sharded_book.ShardedAddressBook(path, shards=3, processes=1)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        book = addressbook.AddressBook()
+        cache = main.ResultCache(limit=2)
+        cache.put(book, "a", book.version, "A")
+        cache.put(book, "b", book.version, "B")
+        self.assertEqual(cache.get(book, "a"), "A")
+        cache.put(book, "c", book.version, "C")
+        self.assertIsNone(cache.get(book, "b"))
+        self.assertEqual(cache.get(book, "a"), "A")
+        self.assertEqual(cache.get(book, "c"), "C")
+        self.assertEqual(cache.to_dict(), {"size": 2, "limit": 2, "hits": 3, "misses": 1})
+
+    def test_entries_belong_to_their_book(self):
+        book, other = addressbook.AddressBook(), addressbook.AddressBook()
+        cache = main.ResultCache()
+        cache.put(book, "a", book.version, "A")
+        self.assertIsNone(cache.get(other, "a"))
+        self.assertEqual(cache.get(book, "a"), "A")
+
+    def test_result_computed_during_a_change_is_stale(self):
+        book = addressbook.AddressBook()
+        cache = main.ResultCache()
+        version = book.version
+        book.add_record(addressbook.Record("Ann"))
+        cache.put(book, "a", version, "A")
+        self.assertIsNone(cache.get(book, "a"))
+
+
+if __name__ == "__main__":
+    unittest.main()